@@ -1,14 +1,21 @@
+import os
+
 from symgraph.model import Model, model_contexts
 
-print(model_contexts)
-with Model("root") as root:
+# Printing the contexts is only useful when debugging: set SYMGRAPH_DEBUG to
+# enable it. Running with `python -O` always disables it.
+DEBUG = __debug__ and bool(os.getenv("SYMGRAPH_DEBUG"))
+
+if DEBUG:
     print(model_contexts)
+with Model("root") as root:
+    if DEBUG:
+        print(model_contexts)
 
     with Model("first") as first:
-        print(model_contexts.active_model)
+        if DEBUG:
+            print(model_contexts.current_context)
         x = 1
 
     with Model("second") as second:
         y = 1
-
-    
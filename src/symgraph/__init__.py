@@ -1,4 +1,5 @@
-from symgraph.differentiator import differentiate_node
+from symgraph.arena import ExprArena
+from symgraph.differentiator import differentiate, differentiate_node, gradient
 from symgraph.expression import (
     Node,
     Constant,
@@ -11,6 +12,10 @@ from symgraph.expression import (
     Sqrt,
     Ln,
     Exp,
+    NaryAdd,
+    NaryMul,
+    MulAdd,
+    Abs,
 )
 
 from symgraph.rewriter import (
@@ -30,7 +35,14 @@ __all__ = [
     "Sqrt",
     "Ln",
     "Exp",
+    "NaryAdd",
+    "NaryMul",
+    "MulAdd",
+    "Abs",
+    "differentiate",
     "differentiate_node",
+    "gradient",
     "Rewriter",
     "rewriter",
+    "ExprArena",
 ]
@@ -0,0 +1,565 @@
+# arena.py
+"""Struct-of-arrays storage for expression DAGs.
+
+An `ExprArena` stores each node as one row of parallel numpy columns instead of
+a heap object pointing at its children. Rows are hash-consed, so structurally
+identical subexpressions share a row, and children are always appended before
+their parents: row order is a topological order, and whole-graph passes are
+forward loops over the columns rather than pointer-chasing recursions.
+
+`ExprArena.evaluate_numba` runs such a loop as one numba-compiled kernel,
+computing every row for one block of the inputs before moving on to the
+next, so the whole expression is evaluated without full-size intermediate
+arrays.
+"""
+
+from __future__ import annotations
+
+import functools
+from collections.abc import Callable, Mapping
+from typing import Any
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+from symgraph.expression import (
+    TAG_ADD,
+    TAG_CONST,
+    TAG_DIV,
+    TAG_EXP,
+    TAG_LN,
+    TAG_MUL,
+    TAG_NEG,
+    TAG_POW,
+    TAG_SQRT,
+    TAG_SUB,
+    TAG_SYMBOL,
+    Add,
+    BinaryOperation,
+    Constant,
+    Divide,
+    Exp,
+    Exponentiation,
+    Ln,
+    Multiply,
+    Negation,
+    Node,
+    Operation,
+    Sqrt,
+    Subtract,
+    Symbol,
+    SymbolicConstant,
+    const,
+)
+
+_OPERATION_TYPES: dict[int, type[Node]] = {
+    cls.TAG: cls
+    for cls in (
+        Add,
+        Subtract,
+        Multiply,
+        Divide,
+        Exponentiation,
+        Negation,
+        Sqrt,
+        Exp,
+        Ln,
+    )
+}
+
+# Ufunc evaluating each operation row, indexed by tag
+_ROW_UFUNCS: list[np.ufunc | None] = [None] * (max(_OPERATION_TYPES) + 1)
+for _tag, _ufunc in (
+    (TAG_ADD, np.add),
+    (TAG_SUB, np.subtract),
+    (TAG_MUL, np.multiply),
+    (TAG_DIV, np.divide),
+    (TAG_POW, np.power),
+    (TAG_NEG, np.negative),
+    (TAG_SQRT, np.sqrt),
+    (TAG_EXP, np.exp),
+    (TAG_LN, np.log),
+):
+    _ROW_UFUNCS[_tag] = _ufunc
+del _tag, _ufunc
+
+NO_CHILD = -1
+# `name_id` of constant rows holding an integer, so `to_node` rebuilds the
+# constant with its original type; other plain constants have -1
+INT_CONSTANT = -2
+# Elements of the inputs `ExprArena.evaluate_numba` computes each row for at once
+_BLOCK = 256
+
+
+@functools.cache
+def _row_kernel() -> Callable[..., NDArray[np.float64]]:
+    """Compile the numba kernel of `ExprArena.evaluate_numba` on first use."""
+    import numba
+
+    # The numpy error model returns inf and nan like numpy does, where the
+    # default would raise on division by zero
+    @numba.njit(error_model="numpy")
+    def evaluate_rows(tags, lhs, rhs, value, name_id, inputs, varies):
+        # The columns hold only the rows the root depends on, root last, with
+        # `lhs` and `rhs` indexing into them
+        count = len(tags)
+        root = count - 1
+        n = inputs.shape[1]
+        out = np.empty(n)
+        scratch = np.empty((count, _BLOCK))
+        # Rows that depend on no varying input are the same for every element:
+        # they are computed with the first block and kept for the others
+        uniform = np.zeros(count, dtype=np.bool_)
+        for row in range(count):
+            if tags[row] == TAG_CONST:
+                uniform[row] = True
+            elif tags[row] == TAG_SYMBOL:
+                uniform[row] = not varies[name_id[row]]
+            else:
+                uniform[row] = uniform[lhs[row]] and (
+                    rhs[row] == NO_CHILD or uniform[rhs[row]]
+                )
+        for start in range(0, n, _BLOCK):
+            size = min(_BLOCK, n - start)
+            for row in range(count):
+                if start and uniform[row]:
+                    continue
+                tag = tags[row]
+                result = scratch[row]
+                if tag == TAG_CONST:
+                    result[:] = value[row]
+                    continue
+                if tag == TAG_SYMBOL:
+                    result[:size] = inputs[name_id[row], start : start + size]
+                    continue
+                left = scratch[lhs[row]]
+                right = scratch[rhs[row]] if rhs[row] != NO_CHILD else left
+                if (
+                    tag == TAG_POW
+                    and tags[rhs[row]] == TAG_CONST
+                    and value[rhs[row]] == 2.0
+                ):
+                    tag = TAG_MUL  # x ** 2 as x * x, which is much cheaper
+                    right = left
+                # One branch per row and block; the loops below are branch-free
+                if tag == TAG_ADD:
+                    for j in range(size):
+                        result[j] = left[j] + right[j]
+                elif tag == TAG_SUB:
+                    for j in range(size):
+                        result[j] = left[j] - right[j]
+                elif tag == TAG_MUL:
+                    for j in range(size):
+                        result[j] = left[j] * right[j]
+                elif tag == TAG_DIV:
+                    for j in range(size):
+                        result[j] = left[j] / right[j]
+                elif tag == TAG_POW:
+                    for j in range(size):
+                        result[j] = left[j] ** right[j]
+                elif tag == TAG_NEG:
+                    for j in range(size):
+                        result[j] = -left[j]
+                elif tag == TAG_SQRT:
+                    for j in range(size):
+                        result[j] = np.sqrt(left[j])
+                elif tag == TAG_EXP:
+                    for j in range(size):
+                        result[j] = np.exp(left[j])
+                else:
+                    for j in range(size):
+                        result[j] = np.log(left[j])
+            out[start : start + size] = scratch[root, :size]
+        return out
+
+    return evaluate_rows
+
+
+class ExprArena:
+    """Expression DAG stored as columns `tag`, `lhs`, `rhs`, `value` and `name_id`.
+
+    `lhs`/`rhs` hold row indices of the operands (`NO_CHILD` when absent),
+    `value` holds the value of constant rows and `name_id` indexes `names` for
+    symbol rows (and for the symbol of a SymbolicConstant). Constants without a
+    symbol have `name_id` -1, or `INT_CONSTANT` if their value is an integer.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.tag: NDArray[np.uint8] = np.empty(capacity, dtype=np.uint8)
+        self.lhs: NDArray[np.int32] = np.empty(capacity, dtype=np.int32)
+        self.rhs: NDArray[np.int32] = np.empty(capacity, dtype=np.int32)
+        self.value: NDArray[np.float64] = np.empty(capacity, dtype=np.float64)
+        self.name_id: NDArray[np.int32] = np.empty(capacity, dtype=np.int32)
+        self.names: list[str] = []
+        self.labels: list[str | None] = []  # LaTeX symbol of each name
+        self.size = 0
+        self._name_ids: dict[str, int] = {}
+        self._rows: dict[tuple[int, int, int, float, int], int] = {}
+        # Per root evaluated with numba, the columns of just the rows it
+        # depends on, see `_program_of`
+        self._programs: dict[int, tuple[NDArray[Any], ...]] = {}
+        self.zero = self.constant(0)
+        self.one = self.constant(1)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def intern_name(self, name: str, label: str | None = None) -> int:
+        """Return the id of `name`, registering it on first use."""
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self.names)
+            self.names.append(name)
+            self.labels.append(label)
+        return name_id
+
+    def add(
+        self,
+        tag: int,
+        lhs: int = NO_CHILD,
+        rhs: int = NO_CHILD,
+        value: float = 0.0,
+        name_id: int = -1,
+    ) -> int:
+        """Append a row, or return the existing row with the same contents."""
+        key = (tag, lhs, rhs, value, name_id)
+        row = self._rows.get(key)
+        if row is not None:
+            return row
+        row = self.size
+        if row == len(self.tag):
+            self._grow()
+        self.tag[row] = tag
+        self.lhs[row] = lhs
+        self.rhs[row] = rhs
+        self.value[row] = value
+        self.name_id[row] = name_id
+        self.size += 1
+        self._rows[key] = row
+        return row
+
+    def constant(self, value: float, symbol: str | None = None) -> int:
+        """Return the row of a constant, optionally shown as `symbol`."""
+        if symbol is not None:
+            name_id = self.intern_name(symbol)
+        elif isinstance(value, int | np.integer):
+            name_id = INT_CONSTANT
+        else:
+            name_id = -1
+        return self.add(TAG_CONST, value=float(value), name_id=name_id)
+
+    def symbol(self, name: str, label: str | None = None) -> int:
+        """Return the row of the symbol `name`."""
+        return self.add(TAG_SYMBOL, name_id=self.intern_name(name, label))
+
+    def _grow(self) -> None:
+        capacity = 2 * len(self.tag)
+        for column in ("tag", "lhs", "rhs", "value", "name_id"):
+            old = getattr(self, column)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[: self.size] = old[: self.size]
+            setattr(self, column, new)
+
+    def intern_node(self, node: Node) -> int:
+        """Lower an expression into the arena and return the row of its root.
+
+        Args:
+            node: Root of the expression to store.
+
+        Returns:
+            Row index of `node`.
+        """
+        rows: dict[int, int] = {}
+        stack = [node]
+        while stack:
+            current = stack[-1]
+            if id(current) in rows:
+                stack.pop()
+                continue
+            children = current.operands if isinstance(current, Operation) else []
+            pending = [child for child in children if id(child) not in rows]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            rows[id(current)] = self._row_for(
+                current, [rows[id(child)] for child in children]
+            )
+        return rows[id(node)]
+
+    def _row_for(self, node: Node, children: list[int]) -> int:
+        if isinstance(node, SymbolicConstant):
+            return self.constant(node.value, node.symbol)
+        if isinstance(node, Constant):
+            return self.constant(node.value)
+        if isinstance(node, Symbol):
+            return self.symbol(node.name, node.symbol)
+        tag = node.TAG
+        if tag not in _OPERATION_TYPES:
+            raise NotImplementedError(f"Cannot store node of type {type(node)}")
+        if isinstance(node, BinaryOperation):
+            return self.add(tag, children[0], children[1])
+        return self.add(tag, children[0])
+
+    def reachable(self, root: int) -> NDArray[np.bool_]:
+        """Mask of the rows `root` depends on, itself included."""
+        mask = np.zeros(root + 1, dtype=np.bool_)
+        mask[root] = True
+        lhs, rhs = self.lhs, self.rhs
+        for row in range(root, -1, -1):
+            if mask[row]:
+                if lhs[row] != NO_CHILD:
+                    mask[lhs[row]] = True
+                if rhs[row] != NO_CHILD:
+                    mask[rhs[row]] = True
+        return mask
+
+    def _program_of(self, root: int) -> tuple[NDArray[Any], ...]:
+        """Columns `tag`, `lhs`, `rhs`, `value`, `name_id` of the rows `root` needs.
+
+        The rows keep their order, so `root` comes last, and `lhs`/`rhs` are
+        renumbered to positions within them. The kernel's scratch therefore
+        scales with the size of the expression, not with that of the arena.
+        """
+        # Rows are never modified once added, so neither is what a row reaches
+        program = self._programs.get(root)
+        if program is None:
+            rows = np.flatnonzero(self.reachable(root))
+            position = np.full(root + 2, NO_CHILD, dtype=np.int32)
+            position[rows] = np.arange(len(rows), dtype=np.int32)
+            # NO_CHILD (-1) indexes the trailing NO_CHILD entry of `position`
+            program = self._programs[root] = (
+                self.tag[rows],
+                position[self.lhs[rows]],
+                position[self.rhs[rows]],
+                self.value[rows],
+                self.name_id[rows],
+            )
+        return program
+
+    def evaluate_numba(
+        self, root: int, values: Mapping[str, ArrayLike]
+    ) -> NDArray[np.float64]:
+        """Evaluate the expression at `root` in one numba-compiled loop.
+
+        The values are broadcast against each other, and the kernel computes
+        the rows `root` depends on for one cache-sized block of elements at a
+        time, so no full-size intermediate arrays are allocated. Rows that do
+        not depend on an array input are computed once. Computes in float64.
+        Without numba this falls back to `evaluate`.
+
+        This pays off for arithmetic on large arrays, where `evaluate` is
+        bound by the memory traffic of its temporaries; numba's scalar `exp`
+        and `log` are slower than numpy's vectorized ones.
+
+        Args:
+            root: Row of the expression to evaluate.
+            values: Mapping of variable names to their values.
+
+        Returns:
+            Computed result as a numpy array.
+        """
+        try:
+            kernel = _row_kernel()
+        except ImportError:
+            return self.evaluate(root, values)
+        program = self._program_of(root)
+        tags, program_name_ids = program[0], program[4]
+        name_ids = program_name_ids[tags == TAG_SYMBOL].tolist()
+        arrays = []
+        for name_id in name_ids:
+            name = self.names[name_id]
+            if name not in values:
+                raise ValueError(f"Value for symbol {name} not provided")
+            arrays.append(np.asarray(values[name], dtype=np.float64))
+        varies = np.zeros(len(self.names), dtype=np.bool_)
+        for name_id, array in zip(name_ids, arrays):
+            varies[name_id] = array.size > 1
+        arrays = np.broadcast_arrays(*arrays)
+        shape = arrays[0].shape if arrays else ()
+        inputs = np.empty((len(self.names), int(np.prod(shape))))
+        for name_id, array in zip(name_ids, arrays):
+            inputs[name_id] = array.ravel()
+        out = kernel(*program, inputs, varies)
+        return out.reshape(shape)
+
+    def evaluate(self, root: int, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
+        """Evaluate the expression at `root` with a forward loop over its rows.
+
+        Args:
+            root: Row of the expression to evaluate.
+            values: Mapping of variable names to their values.
+
+        Returns:
+            Computed result as a numpy array.
+        """
+        results: dict[int, Any] = {}
+        tags, lhs, rhs = self.tag, self.lhs, self.rhs
+        for row in np.flatnonzero(self.reachable(root)).tolist():
+            tag = int(tags[row])
+            if tag == TAG_CONST:
+                results[row] = self.value[row]
+            elif tag == TAG_SYMBOL:
+                name = self.names[int(self.name_id[row])]
+                if name not in values:
+                    raise ValueError(f"Value for symbol {name} not provided")
+                results[row] = np.asarray(values[name])
+            elif rhs[row] == NO_CHILD:
+                results[row] = _ROW_UFUNCS[tag](results[int(lhs[row])])
+            else:
+                left, right = results[int(lhs[row])], results[int(rhs[row])]
+                results[row] = _ROW_UFUNCS[tag](left, right)
+        return np.asarray(results[root])
+
+    def to_node(self, root: int) -> Node:
+        """Rebuild a Node expression from the row `root`."""
+        nodes: dict[int, Node] = {}
+        for row in np.flatnonzero(self.reachable(root)).tolist():
+            tag = int(self.tag[row])
+            if tag == TAG_CONST:
+                value = float(self.value[row])
+                name_id = int(self.name_id[row])
+                if name_id >= 0:
+                    nodes[row] = SymbolicConstant(self.names[name_id], value)
+                else:
+                    nodes[row] = const(self._number(row))
+            elif tag == TAG_SYMBOL:
+                name_id = int(self.name_id[row])
+                nodes[row] = Symbol(self.names[name_id], self.labels[name_id])
+            else:
+                cls = _OPERATION_TYPES[tag]
+                left = nodes[int(self.lhs[row])]
+                if issubclass(cls, BinaryOperation):
+                    nodes[row] = cls(left, nodes[int(self.rhs[row])])
+                else:
+                    nodes[row] = cls(left)
+        return nodes[root]
+
+    # Arithmetic on rows, folding constants and identities like the smart
+    # constructors in `symgraph.expression`.
+
+    def _number(self, row: int) -> float | None:
+        if self.tag[row] == TAG_CONST and self.name_id[row] < 0:
+            value = float(self.value[row])
+            return int(value) if self.name_id[row] == INT_CONSTANT else value
+        return None
+
+    def _add(self, left: int, right: int) -> int:
+        if left == self.zero:
+            return right
+        if right == self.zero:
+            return left
+        a, b = self._number(left), self._number(right)
+        if a is not None and b is not None:
+            return self.constant(a + b)
+        return self.add(TAG_ADD, left, right)
+
+    def _sub(self, left: int, right: int) -> int:
+        if right == self.zero:
+            return left
+        if left == self.zero:
+            return self._neg(right)
+        a, b = self._number(left), self._number(right)
+        if a is not None and b is not None:
+            return self.constant(a - b)
+        return self.add(TAG_SUB, left, right)
+
+    def _mul(self, left: int, right: int) -> int:
+        if left == self.zero or right == self.zero:
+            return self.zero
+        if left == self.one:
+            return right
+        if right == self.one:
+            return left
+        a, b = self._number(left), self._number(right)
+        if a is not None and b is not None:
+            return self.constant(a * b)
+        return self.add(TAG_MUL, left, right)
+
+    def _div(self, left: int, right: int) -> int:
+        if left == self.zero:
+            return self.zero
+        if right == self.one:
+            return left
+        return self.add(TAG_DIV, left, right)
+
+    def _neg(self, operand: int) -> int:
+        a = self._number(operand)
+        if a is not None:
+            return self.constant(-a)
+        if self.tag[operand] == TAG_NEG:
+            return int(self.lhs[operand])
+        return self.add(TAG_NEG, operand)
+
+    def differentiate(self, root: int, name: str) -> int:
+        """Differentiate the expression at `root` with respect to symbol `name`.
+
+        Derivatives are computed for every row `root` depends on in one
+        forward sweep over the columns; because children precede parents, each
+        row's operand derivatives are already known when it is reached.
+
+        Args:
+            root: Row of the expression to differentiate.
+            name: Name of the variable to differentiate with respect to.
+
+        Returns:
+            Row of the derivative.
+        """
+        var = self._name_ids.get(name, -2)
+        zero = self.zero
+        deriv = np.full(root + 1, zero, dtype=np.int64)
+        # Rows appended below lie beyond `root`, so the views read here stay valid.
+        tags, lhs, rhs, name_ids = self.tag, self.lhs, self.rhs, self.name_id
+        for row in np.flatnonzero(self.reachable(root)).tolist():
+            tag = tags[row]
+            left, right = int(lhs[row]), int(rhs[row])
+            if tag == TAG_CONST:
+                continue
+            if tag == TAG_SYMBOL:
+                if name_ids[row] == var:
+                    deriv[row] = self.one
+                continue
+            d_left = int(deriv[left])
+            d_right = int(deriv[right]) if right != NO_CHILD else zero
+            if d_left == zero and d_right == zero:
+                continue
+            if tag == TAG_ADD:
+                result = self._add(d_left, d_right)
+            elif tag == TAG_SUB:
+                result = self._sub(d_left, d_right)
+            elif tag == TAG_MUL:
+                result = self._add(self._mul(d_left, right), self._mul(left, d_right))
+            elif tag == TAG_DIV:
+                numerator = self._sub(
+                    self._mul(d_left, right), self._mul(left, d_right)
+                )
+                result = self._div(
+                    numerator, self.add(TAG_POW, right, self.constant(2))
+                )
+            elif tag == TAG_POW:
+                exponent = self._number(right)
+                if exponent is not None:
+                    reduced = self.add(TAG_POW, left, self.constant(exponent - 1))
+                    result = self._mul(self._mul(right, reduced), d_left)
+                else:
+                    result = self._mul(
+                        row,
+                        self._add(
+                            self._mul(d_right, self.add(TAG_LN, left)),
+                            self._mul(right, self._div(d_left, left)),
+                        ),
+                    )
+            elif tag == TAG_NEG:
+                result = self._neg(d_left)
+            elif tag == TAG_SQRT:
+                result = self._div(d_left, self._mul(self.constant(2), row))
+            elif tag == TAG_EXP:
+                result = self._mul(row, d_left)
+            elif tag == TAG_LN:
+                result = self._div(d_left, left)
+            else:
+                raise NotImplementedError(
+                    f"Differentiation not supported for tag {tag}"
+                )
+            deriv[row] = result
+        return int(deriv[root])
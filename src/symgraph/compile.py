@@ -0,0 +1,601 @@
+# compile.py
+"""Lower expression trees to Python source and compile them into functions.
+
+Evaluating a tree node by node through `Node.evaluate` pays a Python call per
+node on every evaluation. Emitting the whole expression as one Python
+expression and compiling it once removes that overhead, and the emitted
+function can be handed to numba to JIT-compile the body. `compile_expr` and
+`compile_to_numba` emit straight-line code instead, computing each repeated
+subexpression once.
+
+Scalar kernels call into `math`; `compile_numpy` emits the same code over
+`np` so it applies to whole arrays, and `compile_ufunc` turns the scalar kernel
+into a numba ufunc, evaluating the expression in a single fused loop over the
+inputs without intermediate arrays. `compile_jax` emits the code over
+`jax.numpy` and wraps it in `jax.jit`, to run on any device jax supports.
+`evaluate_numexpr` and `compile_numexpr` hand the expression to numexpr
+instead, which evaluates it in cache-sized blocks of the inputs.
+Compiled functions are cached by their source, so structurally identical
+expressions share one function.
+"""
+
+from __future__ import annotations
+
+import functools
+import importlib
+import keyword
+import math
+from collections.abc import Callable, Mapping, Sequence
+from typing import Any
+from weakref import WeakKeyDictionary
+
+import numpy as np
+from numpy.typing import ArrayLike, DTypeLike, NDArray
+
+from symgraph.expression import (
+    _INTEGER_POWERS,
+    Abs,
+    Add,
+    Constant,
+    Divide,
+    Exp,
+    Exponentiation,
+    Ln,
+    MulAdd,
+    Multiply,
+    NaryAdd,
+    NaryMul,
+    Negation,
+    Node,
+    Operation,
+    Sqrt,
+    Subtract,
+    Symbol,
+    SymbolicConstant,
+    constant_power,
+    multiply_add,
+)
+
+
+def free_symbols(node: Node) -> list[str]:
+    """Return the names of the symbols in an expression, sorted alphabetically."""
+    names: set[str] = set()
+    seen: set[int] = set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        if isinstance(current, Symbol):
+            names.add(current.name)
+        elif isinstance(current, Operation):
+            stack.extend(current.operands)
+    return sorted(names)
+
+
+def _argument_names(variables: Sequence[str]) -> dict[str, str]:
+    """Map symbol names to valid, distinct Python parameter names."""
+    used: set[str] = set()
+    names: dict[str, str] = {}
+    for i, name in enumerate(variables):
+        arg = name if name.isidentifier() and not keyword.iskeyword(name) else ""
+        # Underscore names are reserved for `_arg<i>` and the temporaries
+        if not arg or arg in used or arg in _MODULES or arg.startswith("_"):
+            arg = f"_arg{i}"
+        used.add(arg)
+        names[name] = arg
+    return names
+
+
+# An emitter renders an operation from the source of its operands and the
+# name of the module (`math`, `np` or `jnp`) providing the elementary
+# functions, or "" to call them unqualified as numexpr does
+type _Emitter = Callable[[list[str], str], str]
+
+
+def _binary(template: str) -> _Emitter:
+    def emit(args: list[str], module: str) -> str:
+        return template.format(L=args[0], R=args[1])
+
+    return emit
+
+
+def _unary(template: str) -> _Emitter:
+    def emit(args: list[str], module: str) -> str:
+        return template.format(O=args[0], M=f"{module}." if module else "")
+
+    return emit
+
+
+def _nary(separator: str) -> _Emitter:
+    def emit(args: list[str], module: str) -> str:
+        if len(args) == 1:
+            # Unary plus copies an array rather than returning the caller's
+            return f"(+{args[0]})"
+        return "(" + separator.join(args) + ")"
+
+    return emit
+
+
+def _multiply_add(args: list[str], module: str) -> str:
+    return f"(({args[0]} * {args[1]}) + {args[2]})"
+
+
+def _constant(node: Constant, names: dict[str, str]) -> str:
+    value = node.value
+    if isinstance(value, np.generic):
+        value = value.item()  # repr of numpy scalars names `np`
+    if isinstance(value, float) and not math.isfinite(value):
+        # Literals rather than names, as every backend's namespace differs
+        if math.isnan(value):
+            return "(1e999 - 1e999)"
+        return "1e999" if value > 0 else "(-1e999)"
+    return repr(value)
+
+
+def _symbol(node: Symbol, names: dict[str, str]) -> str:
+    return names.get(node.name, node.name)
+
+
+# Operations render from the source of their operands, leaves from the node
+_OPERATORS: dict[type[Node], _Emitter] = {
+    Add: _binary("({L} + {R})"),
+    Subtract: _binary("({L} - {R})"),
+    Multiply: _binary("({L} * {R})"),
+    Divide: _binary("({L} / {R})"),
+    Exponentiation: _binary("({L} ** {R})"),
+    Negation: _unary("(-{O})"),
+    Sqrt: _unary("{M}sqrt({O})"),
+    Exp: _unary("{M}exp({O})"),
+    Ln: _unary("{M}log({O})"),
+    Abs: _unary("abs({O})"),
+    NaryAdd: _nary(" + "),
+    NaryMul: _nary(" * "),
+    MulAdd: _multiply_add,
+}
+_LEAVES: dict[type[Node], Callable[[Any, dict[str, str]], str]] = {
+    Symbol: _symbol,
+    Constant: _constant,
+    SymbolicConstant: _constant,
+}
+# Modules the emitted source may refer to, by the name it uses for them
+_MODULES: dict[str, str] = {"math": "math", "np": "numpy", "jnp": "jax.numpy"}
+# Functions the source emitted by `evaluation_source` calls, so that it keeps
+# the fast paths of `Exponentiation._compute` and `MulAdd._compute`
+_HELPERS: dict[str, Callable[..., Any]] = {
+    "_constant_power": constant_power,
+    "_multiply_add": multiply_add,
+}
+
+
+def _evaluation_operation(node: Operation, args: list[str]) -> str:
+    """Render an operation over `np` the way its `_compute` computes it."""
+    if type(node) is MulAdd:
+        return f"_multiply_add({', '.join(args)})"
+    if type(node) is Exponentiation and isinstance(node.exponent, Constant):
+        for value in _INTEGER_POWERS:
+            if node.exponent.value == value:
+                return f"_constant_power({args[0]}, {args[1]}, {value!r})"
+    return _operator(node)(args, "np")
+
+
+def _operator(node: Node) -> _Emitter:
+    emit = _OPERATORS.get(type(node))
+    if emit is None:
+        raise NotImplementedError(f"Cannot compile node of type {type(node)}")
+    return emit
+
+
+def to_source(
+    node: Node, names: dict[str, str] | None = None, module: str = "math"
+) -> str:
+    """Render an expression as a Python expression over the `math` module.
+
+    Args:
+        node: The expression to render.
+        names: Optional mapping from symbol names to the identifiers to emit.
+        module: Module providing `sqrt`, `exp` and `log`: `"math"`, `"np"`
+            or `"jnp"`, or `""` for unqualified calls.
+
+    Returns:
+        Python source for the expression.
+    """
+    names = names or {}
+    sources: dict[int, str] = {}
+    for current in node.postorder():
+        leaf = _LEAVES.get(type(current))
+        if leaf is not None:
+            sources[id(current)] = leaf(current, names)
+            continue
+        args = [sources[id(operand)] for operand in current.operands]
+        sources[id(current)] = _operator(current)(args, module)
+    return sources[id(node)]
+
+
+def function_source(
+    node: Node, variables: Sequence[str], name: str = "f", module: str = "math"
+) -> str:
+    """Return the source of a function `name(*variables)` evaluating `node`."""
+    names = _argument_names(variables)
+    params = ", ".join(names[v] for v in variables)
+    return f"def {name}({params}):\n    return {to_source(node, names, module)}\n"
+
+
+def cse_source(
+    node: Node, variables: Sequence[str], name: str = "f", module: str = "math"
+) -> str:
+    """Return the source of `name(*variables)` as straight-line code.
+
+    Every distinct operation is assigned once to a temporary `_t<i>`, so a
+    subexpression that occurs several times in `node` (as the same object or
+    as an identical copy) is evaluated only once per call.
+    """
+    names = _argument_names(variables)
+    lines = [f"def {name}({', '.join(names[v] for v in variables)}):"]
+    sources: dict[int, str] = {}  # id(node) -> temporary or leaf source
+    temps: dict[str, str] = {}  # right-hand side -> temporary holding it
+    stack: list[tuple[Node, bool]] = [(node, False)]
+    while stack:
+        current, expanded = stack.pop()
+        key = id(current)
+        if key in sources:
+            continue
+        leaf = _LEAVES.get(type(current))
+        if leaf is not None:
+            sources[key] = leaf(current, names)
+            continue
+        emit = _operator(current)
+        if not expanded:
+            stack.append((current, True))
+            stack.extend((operand, False) for operand in reversed(current.operands))
+            continue
+        # Operands are temporaries or leaves, so identical subexpressions
+        # render to the same right-hand side
+        rhs = emit([sources[id(operand)] for operand in current.operands], module)
+        temp = temps.get(rhs)
+        if temp is None:
+            temp = temps[rhs] = f"_t{len(temps)}"
+            lines.append(f"    {temp} = {rhs}")
+        sources[key] = temp
+    lines.append(f"    return {sources[id(node)]}")
+    return "\n".join(lines) + "\n"
+
+
+def evaluation_source(node: Node) -> tuple[str, tuple[Node, ...]]:
+    """Return the source of `f(*leaves)` computing `node` over `np`.
+
+    Unlike `cse_source`, the parameters are the distinct leaves of `node`,
+    symbols and constants alike, so the caller evaluates them exactly like
+    `Node.evaluate` does. Every distinct operation is assigned once to a
+    temporary, which is deleted after its last use to free its array.
+
+    Returns:
+        The source, and the leaves in the order of the parameters.
+    """
+    order = list(node.postorder())
+    leaves = tuple(n for n in order if not isinstance(n, Operation))
+    sources = {id(leaf): f"_a{i}" for i, leaf in enumerate(leaves)}
+    operations = [n for n in order if isinstance(n, Operation)]
+    last_use: dict[int, int] = {}
+    for i, operation in enumerate(operations):
+        for operand in operation.operands:
+            last_use[id(operand)] = i
+    lines = [f"def f({', '.join(sources.values())}):"]
+    for i, operation in enumerate(operations):
+        args = [sources[id(operand)] for operand in operation.operands]
+        sources[id(operation)] = f"_t{i}"
+        lines.append(f"    _t{i} = {_evaluation_operation(operation, args)}")
+        dead = {
+            sources[id(operand)]
+            for operand in operation.operands
+            if isinstance(operand, Operation) and last_use[id(operand)] == i
+        }
+        if dead:
+            lines.append(f"    del {', '.join(sorted(dead))}")
+    lines.append(f"    return {sources[id(node)]}")
+    return "\n".join(lines) + "\n", leaves
+
+
+def evaluation_function(node: Node) -> tuple[Callable[..., Any], tuple[Node, ...]]:
+    """Compile `evaluation_source(node)`; used by `Operation.evaluate`."""
+    source, leaves = evaluation_source(node)
+    return _exec_source(source, "np"), leaves
+
+
+def _parameters(node: Node, variables: Sequence[str] | None) -> list[str]:
+    variables = free_symbols(node) if variables is None else list(variables)
+    missing = set(free_symbols(node)) - set(variables)
+    if missing:
+        raise ValueError(f"Values for symbols {sorted(missing)} are not parameters")
+    return variables
+
+
+def _build_function(
+    node: Node,
+    variables: Sequence[str] | None,
+    source: Callable[..., str] = function_source,
+    module: str = "math",
+) -> tuple[Callable[..., Any], list[str]]:
+    variables = _parameters(node, variables)
+    return _exec_source(source(node, variables, module=module), module), variables
+
+
+@functools.lru_cache(maxsize=256)
+def _exec_source(source: str, module: str = "math") -> Callable[..., Any]:
+    """Execute the source of a function `f` and return it, once per source."""
+    namespace: dict[str, Any] = {
+        module: importlib.import_module(_MODULES[module]),
+        **_HELPERS,
+    }
+    exec(source, namespace)
+    return namespace["f"]
+
+
+def _variable_names(variables: Sequence[str | Symbol] | None) -> list[str] | None:
+    if variables is None:
+        return None
+    return [v.name if isinstance(v, Symbol) else v for v in variables]
+
+
+def compile_expr(
+    node: Node, variables: Sequence[str | Symbol] | None = None
+) -> Callable[..., Any]:
+    """Compile an expression into a plain Python function with CSE.
+
+    Args:
+        node: The expression to compile.
+        variables: Parameter order of the compiled function, as symbols or
+            names. Defaults to the expression's symbols sorted by name.
+
+    Returns:
+        A function taking one scalar per variable. See `cse_source`.
+    """
+    function, _ = _build_function(node, _variable_names(variables), cse_source)
+    return function
+
+
+def compile_to_numba(
+    node: Node,
+    variables: Sequence[str | Symbol] | None = None,
+    signature: Any = None,
+) -> Callable[..., Any]:
+    """JIT-compile a scalar expression with numba.
+
+    Args:
+        node: The expression to compile.
+        variables: Parameter order of the compiled function, as symbols or
+            names. Defaults to the expression's symbols sorted by name.
+        signature: Optional numba signature, e.g. `"float64(float64, float64)"`,
+            to compile eagerly instead of on the first call.
+
+    Returns:
+        The `numba.njit`-compiled function.
+    """
+    try:
+        import numba
+    except ImportError as e:
+        raise ImportError("compile_to_numba requires numba to be installed") from e
+
+    # The straight-line body also keeps deep trees clear of the parser's
+    # nesting limit, which the single-expression source can exceed
+    function, _ = _build_function(node, _variable_names(variables), cse_source)
+    # `cache=True` is not used: numba can only cache functions defined in files
+    if signature is not None:
+        return numba.njit(signature)(function)
+    return numba.njit(function)
+
+
+def _cast_arguments(
+    function: Callable[..., Any], cast: Callable[[Any], Any]
+) -> Callable[..., Any]:
+    @functools.wraps(function)
+    def cast_function(*args: Any) -> Any:
+        return function(*map(cast, args))
+
+    return cast_function
+
+
+def compile_numpy(
+    node: Node,
+    variables: Sequence[str | Symbol] | None = None,
+    dtype: DTypeLike = None,
+) -> Callable[..., Any]:
+    """Compile an expression into a function of numpy arrays.
+
+    The function is straight-line code over `np` (see `cse_source`): inputs
+    broadcast like in `Node.evaluate`, but the tree is not walked per call.
+    Constants are emitted as Python numbers, which do not promote the dtype
+    of the arrays they are combined with.
+
+    Args:
+        node: The expression to compile.
+        variables: Parameter order of the compiled function, as symbols or
+            names. Defaults to the expression's symbols sorted by name.
+        dtype: Optional dtype, e.g. `np.float32`, the arguments are cast to.
+
+    Returns:
+        A function taking one array (or scalar) per variable.
+    """
+    function, _ = _build_function(
+        node, _variable_names(variables), cse_source, module="np"
+    )
+    if dtype is None:
+        return function
+    return _cast_arguments(function, functools.partial(np.asarray, dtype=dtype))
+
+
+def compile_jax(
+    node: Node,
+    variables: Sequence[str | Symbol] | None = None,
+    dtype: DTypeLike = None,
+) -> Callable[..., Any]:
+    """Compile an expression into a `jax.jit` function of jax arrays.
+
+    The function is the straight-line code of `compile_numpy` over
+    `jax.numpy`, so it runs on whichever device the inputs live on and can be
+    transformed further with `jax.grad` or `jax.vmap`.
+
+    Args:
+        node: The expression to compile.
+        variables: Parameter order of the compiled function, as symbols or
+            names. Defaults to the expression's symbols sorted by name.
+        dtype: Optional dtype, e.g. `jnp.bfloat16`, the arguments are cast to.
+
+    Returns:
+        The `jax.jit`-compiled function.
+    """
+    try:
+        import jax
+        import jax.numpy as jnp
+    except ImportError as e:
+        raise ImportError("compile_jax requires jax to be installed") from e
+
+    function, _ = _build_function(
+        node, _variable_names(variables), cse_source, module="jnp"
+    )
+    if dtype is not None:
+        function = _cast_arguments(
+            function, functools.partial(jnp.asarray, dtype=dtype)
+        )
+    return jax.jit(function)
+
+
+def compile_ufunc(
+    node: Node,
+    variables: Sequence[str | Symbol] | None = None,
+    dtype: DTypeLike = None,
+) -> Callable[..., Any]:
+    """Compile an expression into a fused elementwise kernel.
+
+    With numba installed, the scalar kernel is turned into a ufunc with
+    `numba.vectorize`, so evaluating it on arrays is one loop over the
+    broadcast inputs with no intermediate arrays. The ufunc is compiled for
+    the input types of its first call, or eagerly for `dtype` only. Without
+    numba this falls back to `compile_numpy`.
+
+    Args:
+        node: The expression to compile.
+        variables: Parameter order of the compiled function, as symbols or
+            names. Defaults to the expression's symbols sorted by name.
+        dtype: Optional dtype, e.g. `np.float32`, of the arguments and the
+            result. Inputs of other dtypes are cast to it.
+
+    Returns:
+        A function taking one array (or scalar) per variable.
+    """
+    try:
+        import numba  # noqa: F401
+    except ImportError:
+        return compile_numpy(node, variables, dtype)
+    names = _parameters(node, _variable_names(variables))
+    if dtype is None:
+        return _vectorize(cse_source(node, names))
+    scalar = np.dtype(dtype).name
+    signature = f"{scalar}({', '.join([scalar] * len(names))})"
+    ufunc = _vectorize(cse_source(node, names), signature)
+    # The ufunc only has the `dtype` loop, which other dtypes don't cast to safely
+    return _cast_arguments(ufunc, functools.partial(np.asarray, dtype=dtype))
+
+
+@functools.lru_cache(maxsize=256)
+def _vectorize(source: str, signature: str | None = None) -> Callable[..., Any]:
+    import numba
+
+    if signature is not None:
+        return numba.vectorize([signature])(_exec_source(source))
+    return numba.vectorize(_exec_source(source))
+
+
+# Source and argument names of each expression passed to `evaluate_numexpr`
+_NUMEXPR_SOURCES: WeakKeyDictionary[Node, tuple[str, dict[str, str]]] = (
+    WeakKeyDictionary()
+)
+
+
+def numexpr_source(node: Node) -> tuple[str, dict[str, str]]:
+    """Render an expression in numexpr syntax.
+
+    Returns:
+        The source, and the mapping from symbol names to the identifiers it
+        uses for them. Both are cached on `node` while it is alive.
+    """
+    # Only operations are cached: they hash by identity, whereas equal leaves
+    # such as Constant(2) and Constant(2.0) would share one entry
+    cached = _NUMEXPR_SOURCES.get(node) if isinstance(node, Operation) else None
+    if cached is None:
+        names = _argument_names(free_symbols(node))
+        cached = (to_source(node, names, module=""), names)
+        if isinstance(node, Operation):
+            _NUMEXPR_SOURCES[node] = cached
+    return cached
+
+
+def evaluate_numexpr(node: Node, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
+    """Evaluate an expression with numexpr.
+
+    numexpr compiles the expression once and evaluates it blockwise over the
+    inputs, so no full-size temporaries are allocated for the intermediate
+    operations. Suited to elementwise expressions over large arrays with a
+    moderate number of operations and inputs.
+
+    Args:
+        node: The expression to evaluate.
+        values: Mapping of variable names to their values.
+
+    Returns:
+        Computed result as a numpy array.
+    """
+    try:
+        import numexpr
+    except ImportError as e:
+        raise ImportError("evaluate_numexpr requires numexpr to be installed") from e
+
+    source, names = numexpr_source(node)
+    local_dict: dict[str, ArrayLike] = {}
+    for name, arg in names.items():
+        if name not in values:
+            raise ValueError(f"Value for symbol {name} not provided")
+        local_dict[arg] = values[name]
+    return numexpr.evaluate(source, local_dict=local_dict, global_dict={})
+
+
+def compile_numexpr(
+    node: Node,
+    variables: Sequence[str | Symbol] | None = None,
+    dtype: DTypeLike = None,
+) -> Callable[..., Any]:
+    """Compile an expression into a function evaluated by numexpr.
+
+    The numexpr source is rendered once, here, rather than on every call; see
+    `evaluate_numexpr`.
+
+    Args:
+        node: The expression to compile.
+        variables: Parameter order of the compiled function, as symbols or
+            names. Defaults to the expression's symbols sorted by name.
+        dtype: Optional dtype, e.g. `np.float32`, the arguments are cast to.
+
+    Returns:
+        A function taking one array (or scalar) per variable.
+    """
+    try:
+        import numexpr
+    except ImportError as e:
+        raise ImportError("compile_numexpr requires numexpr to be installed") from e
+
+    variables = _parameters(node, _variable_names(variables))
+    source, names = numexpr_source(node)
+    # Parameters the expression does not use are accepted and ignored
+    used = [i for i, name in enumerate(variables) if name in names]
+    args = [names[variables[i]] for i in used]
+
+    def function(*values: ArrayLike) -> NDArray[Any]:
+        if len(values) != len(variables):
+            raise TypeError(f"Expected {len(variables)} arguments, got {len(values)}")
+        local_dict = {
+            arg: np.asarray(values[i], dtype=dtype) for arg, i in zip(args, used)
+        }
+        return numexpr.evaluate(source, local_dict=local_dict, global_dict={})
+
+    return function
@@ -0,0 +1,263 @@
+# evaluator.py
+"""Iterative evaluation of expression DAGs.
+
+`Node.evaluate` recurses through the tree and evaluates a shared subexpression
+once per reference. `evaluate_dag` instead evaluates every distinct node once,
+in post-order, with numpy ufuncs. Intermediate results are dropped as soon as
+their last parent has used them, and their buffers are reused as `out=`
+arrays for later results of the same shape and dtype.
+
+`evaluate_many` shares that work across several expressions evaluated at the
+same values, such as a function and its gradient from
+`symgraph.differentiator.gradient`.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+import numpy as np
+from numpy.typing import ArrayLike, DTypeLike, NDArray
+
+from symgraph.expression import (
+    _INTEGER_POWERS,
+    Abs,
+    Add,
+    Constant,
+    Divide,
+    Exp,
+    Exponentiation,
+    Ln,
+    MulAdd,
+    Multiply,
+    NaryAdd,
+    NaryMul,
+    Negation,
+    Node,
+    Operation,
+    Sqrt,
+    Subtract,
+    Symbol,
+)
+
+_UFUNCS: dict[type[Node], np.ufunc] = {
+    Add: np.add,
+    Subtract: np.subtract,
+    Multiply: np.multiply,
+    Divide: np.divide,
+    Exponentiation: np.power,
+    Negation: np.negative,
+    Sqrt: np.sqrt,
+    Exp: np.exp,
+    Ln: np.log,
+    Abs: np.absolute,
+    # n-ary operations fold their operands pairwise with the binary ufunc
+    NaryAdd: np.add,
+    NaryMul: np.multiply,
+}
+
+type _FreeList = dict[tuple[tuple[int, ...], np.dtype[Any]], list[NDArray[Any]]]
+
+
+def postorder(root: Node) -> list[Node]:
+    """Return the distinct nodes of `root`, each after all of its operands."""
+    return list(root.postorder())
+
+
+def _apply(ufunc: np.ufunc, args: tuple[NDArray[Any], ...], free: _FreeList) -> Any:
+    """Call `ufunc`, writing into a free buffer of the result's shape and dtype."""
+    shape = np.broadcast_shapes(*(arg.shape for arg in args))
+    if shape:
+        dtype = ufunc.resolve_dtypes((*(arg.dtype for arg in args), None))[-1]
+        buffers = free.get((shape, dtype))
+        if buffers:
+            return ufunc(*args, out=buffers.pop())
+    return ufunc(*args)
+
+
+def _multiply_add(args: list[NDArray[Any]], free: _FreeList) -> Any:
+    """Compute `left * right + addend`, adding into the product's buffer if possible."""
+    left, right, addend = args
+    product = np.asarray(_apply(np.multiply, (left, right), free))
+    if (
+        product.ndim
+        and product.shape == np.broadcast_shapes(product.shape, addend.shape)
+        and np.add.resolve_dtypes((product.dtype, addend.dtype, None))[-1]
+        == product.dtype
+    ):
+        return np.add(product, addend, out=product)
+    result = _apply(np.add, (product, addend), free)
+    _release(product, free)
+    return result
+
+
+def _constant_power(args: list[NDArray[Any]], value: Any, free: _FreeList) -> Any:
+    """Compute `base ** exponent` for a constant exponent, as `constant_power` does.
+
+    The specialized kernels that are ufuncs write into a free buffer.
+    """
+    base, exponent = args
+    specialized = _INTEGER_POWERS.get(value) if base.dtype.kind in "fc" else None
+    if specialized is None:
+        return _apply(np.power, (base, exponent), free)
+    if isinstance(specialized, np.ufunc):
+        return _apply(specialized, (base,), free)
+    return specialized(base)
+
+
+def _release(array: NDArray[Any], free: _FreeList) -> None:
+    if array.ndim:
+        free.setdefault((array.shape, array.dtype), []).append(array)
+
+
+def evaluate_dag(
+    root: Node, values: Mapping[str, ArrayLike], dtype: DTypeLike = None
+) -> NDArray[Any]:
+    """Evaluate an expression, computing each distinct node once.
+
+    Args:
+        root: The expression to evaluate.
+        values: Mapping of variable names to their values.
+        dtype: Optional dtype the values and constants are cast to, see
+            `Node.evaluate`.
+
+    Returns:
+        Computed result as a numpy array.
+    """
+    order = postorder(root)
+    # Number of references to each node from the distinct nodes above it
+    parents: dict[int, int] = {}
+    for node in order:
+        if isinstance(node, Operation):
+            for operand in node.operands:
+                parents[id(operand)] = parents.get(id(operand), 0) + 1
+
+    results: dict[int, Any] = {}
+    owned: set[int] = set()  # ids of results computed here, whose buffers can be reused
+    free: _FreeList = {}
+    for node in order:
+        key = id(node)
+        if isinstance(node, Constant):
+            results[key] = node.evaluate(values, dtype)
+            continue
+        if isinstance(node, Symbol):
+            if node.name not in values:
+                raise ValueError(f"Value for symbol {node.name} not provided")
+            results[key] = np.asarray(values[node.name], dtype=dtype)
+            continue
+        args = [np.asarray(results[id(operand)]) for operand in node.operands]
+        ufunc = _UFUNCS.get(type(node))
+        if type(node) is MulAdd:
+            result = _multiply_add(args, free)
+        elif type(node) is Exponentiation and isinstance(node.exponent, Constant):
+            result = _constant_power(args, node.exponent.value, free)
+        elif ufunc is None:
+            raise NotImplementedError(f"Cannot evaluate node of type {type(node)}")
+        elif len(args) == 1 and ufunc.nin == 2:
+            # Copy rather than alias: the operand's buffer may be reused below
+            result = _apply(np.positive, tuple(args), free)
+        elif len(args) == ufunc.nin:
+            result = _apply(ufunc, tuple(args), free)
+        else:
+            result = args[0]
+            for i, arg in enumerate(args[1:]):
+                partial = result
+                result = _apply(ufunc, (partial, arg), free)
+                if i:  # the running result is our own intermediate from here on
+                    _release(partial, free)
+        results[key] = result
+        owned.add(key)
+
+        for operand in node.operands:
+            child = id(operand)
+            parents[child] -= 1
+            if parents[child] == 0:
+                array = results.pop(child)
+                if child in owned:
+                    _release(array, free)
+    return np.asarray(results[id(root)])
+
+
+def evaluate_many(
+    roots: Sequence[Node], values: Mapping[str, ArrayLike], dtype: DTypeLike = None
+) -> list[NDArray[Any]]:
+    """Evaluate several expressions at the same values together.
+
+    A node shared by several of the expressions, for instance a primal
+    subexpression that its derivatives reuse, is computed once for all of
+    them rather than once per `evaluate` call.
+
+    Args:
+        roots: The expressions to evaluate.
+        values: Mapping of variable names to their values.
+        dtype: Optional dtype the values and constants are cast to.
+
+    Returns:
+        The result of each expression, in the order of `roots`.
+    """
+    order: list[Node] = []
+    seen: set[int] = set()
+    for root in roots:
+        for node in root.postorder():
+            if id(node) not in seen:
+                seen.add(id(node))
+                order.append(node)
+    # The roots count as a parent each, so their results are never dropped
+    parents: dict[int, int] = {id(root): 1 for root in roots}
+    for node in order:
+        if isinstance(node, Operation):
+            for operand in node.operands:
+                parents[id(operand)] = parents.get(id(operand), 0) + 1
+
+    results: dict[int, Any] = {}
+    for node in order:
+        if not isinstance(node, Operation):
+            results[id(node)] = node.evaluate(values, dtype)
+            continue
+        operands = node.operands
+        results[id(node)] = node._compute(*[results[id(op)] for op in operands])
+        for operand in operands:
+            parents[id(operand)] -= 1
+            if not parents[id(operand)]:
+                del results[id(operand)]
+    return [np.asarray(results[id(root)]) for root in roots]
+
+
+def evaluate_batch(
+    root: Node, values_batch: Mapping[str, ArrayLike], dtype: DTypeLike = None
+) -> NDArray[Any]:
+    """Evaluate an expression for a batch of draws in one vectorized pass.
+
+    Every value has the draws along its leading axis, shape `(n, *event)`.
+    The draw axis of each value is aligned with the others by inserting unit
+    axes after it, so values with different event shapes broadcast against
+    each other per draw, and the whole batch is computed by one
+    `evaluate_dag` call instead of a Python loop over draws.
+
+    Args:
+        root: The expression to evaluate.
+        values_batch: Mapping of variable names to arrays of shape `(n, ...)`.
+        dtype: Optional dtype the values and constants are cast to.
+
+    Returns:
+        Array of shape `(n, ...)` whose i-th entry is the result for draw i.
+    """
+    arrays = {
+        name: np.asarray(value, dtype=dtype) for name, value in values_batch.items()
+    }
+    draws = {array.shape[0] for array in arrays.values() if array.ndim}
+    if len(draws) != 1 or any(array.ndim == 0 for array in arrays.values()):
+        raise ValueError("All batched values need the same leading (draw) axis")
+    (n,) = draws
+    event_ndim = max(array.ndim for array in arrays.values()) - 1
+    aligned = {
+        name: array.reshape(
+            (n,) + (1,) * (event_ndim - array.ndim + 1) + array.shape[1:]
+        )
+        for name, array in arrays.items()
+    }
+    result = evaluate_dag(root, aligned, dtype)
+    if result.shape[:1] != (n,):  # the expression uses none of the values
+        result = np.broadcast_to(result, (n, *result.shape))
+    return result
@@ -1,17 +1,53 @@
 # expression.py
 from __future__ import annotations
-from collections.abc import Mapping
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass, field
+import io
 import math
-from typing import Any, override
+from typing import TYPE_CHECKING, Any, ClassVar, override
+from weakref import WeakKeyDictionary, WeakValueDictionary
 
 import numpy as np
 
-from numpy.typing import ArrayLike, NDArray
+from numpy.typing import ArrayLike, DTypeLike, NDArray
 
 from symgraph.utils import COLORS, RESET_COLOR
 
+if TYPE_CHECKING:
+    from symgraph.arena import ExprArena
+
 type IntoNode = Node | float
 
+# Integer tag of each concrete node type, stored as the class attribute `TAG`
+# so that passes can dispatch with an attribute load and a list index instead
+# of isinstance checks. `symgraph.arena` uses the same values as row tags.
+TAG_CONST = 0
+TAG_SYMBOL = 1
+TAG_ADD = 2
+TAG_SUB = 3
+TAG_MUL = 4
+TAG_DIV = 5
+TAG_POW = 6
+TAG_NEG = 7
+TAG_SQRT = 8
+TAG_EXP = 9
+TAG_LN = 10
+TAG_NARY_ADD = 11
+TAG_NARY_MUL = 12
+TAG_MULADD = 13
+TAG_ABS = 14
+NUM_TAGS = 15
+NO_TAG = -1
+
+
+def _line_prefix(level: int) -> str:
+    return f"{COLORS[level % len(COLORS)]}{'    ' * level}"
+
+
+# Color and indentation each line of the pretty printed tree starts with, per
+# level (the colors cycle with the depth). Extended on demand for deep trees.
+_LINE_PREFIXES = [_line_prefix(level) for level in range(64)]
+
 
 def parse_into_node(into_node: IntoNode) -> Node:
     """
@@ -29,20 +65,150 @@ def parse_into_node(into_node: IntoNode) -> Node:
     return into_node
 
 
-class Node:
-    """Base class for expression tree nodes in a computation graph."""
+# Hash-consing table of the node constructors, see `_Interning`. Operations
+# are keyed on their type and the ids of their operands: an entry keeps its
+# operands alive, so those ids cannot be reused while the entry exists, and an
+# entry disappears once nothing else references its node.
+_INTERN: WeakValueDictionary[tuple[Any, ...], Node] = WeakValueDictionary()
+
+# LaTeX of the operations `to_latex` was called on
+_LATEX: WeakKeyDictionary[Node, str] = WeakKeyDictionary()
+
+# Functions compiled by `Node.compile`, by backend, variables and dtype
+_COMPILED: WeakKeyDictionary[Node, dict[tuple[Any, ...], Callable[..., Any]]] = (
+    WeakKeyDictionary()
+)
+
+
+class _Interning(type):
+    """Metaclass of the nodes: constructing a node returns the live node with
+    the same interning key, if any, instead of building a new one.
+
+    A class's `_intern` turns the constructor arguments into that key and the
+    arguments to build the node from (its operands already parsed into
+    nodes), or gives None as the key for nodes that are never shared.
+    Operations always have a key, so their `__init__` only ever receives
+    parsed operands and does not parse them again.
+    """
+
+    def __call__(cls, *args: Any, **kwargs: Any) -> Any:
+        key, node_args = cls._intern(*args, **kwargs)
+        if key is None:
+            return super().__call__(*args, **kwargs)
+        node = _INTERN.get(key)
+        if node is None:
+            node = _INTERN[key] = super().__call__(*node_args)
+        return node
+
+
+class Node(metaclass=_Interning):
+    """Base class for expression tree nodes in a computation graph.
+
+    Concrete nodes are slotted dataclasses declared with `eq=False`, so that
+    they carry no per-instance `__dict__` and keep hand-written comparisons:
+    operations compare (and hash) by identity, while Constant and Symbol
+    define value-based `__eq__` and a matching `__hash__`.
+
+    Nodes are hash-consed: building an operation over the same operand
+    objects as a live one, a symbol with the same name, or a constant of the
+    same value and type returns the existing node, so structurally identical
+    expressions are one object. Nodes must therefore never be mutated.
+    """
 
-    def evaluate(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
+    # Weak-referenceable so the hash-consing table below does not keep nodes alive
+    __slots__ = ("__weakref__",)
+    TAG: ClassVar[int] = NO_TAG
+
+    @classmethod
+    def _intern(cls, *args: Any, **kwargs: Any) -> tuple[tuple[Any, ...] | None, tuple]:
+        """Returns the interning key and node arguments, see `_Interning`."""
+        return None, args
+
+    def evaluate(
+        self, values: Mapping[str, ArrayLike], dtype: DTypeLike = None
+    ) -> NDArray[Any]:
         """Evaluates the node with given variable values.
 
         Args:
             values: Mapping of variable names to their values.
+            dtype: Optional dtype, e.g. `np.float32`, the values and constants
+                are cast to. By default values keep their own dtype and
+                constants are float64 or int64.
 
         Returns:
             Computed result as a numpy array.
         """
         raise NotImplementedError
 
+    def postorder(self) -> Iterator[Node]:
+        """Yields the distinct nodes of the expression, each after its operands.
+
+        The walk uses an explicit stack, so it is not bounded by the
+        recursion limit.
+        """
+        seen: set[int] = set()
+        stack: list[tuple[Node, bool]] = [(self, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                yield node
+                continue
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            stack.append((node, True))
+            if isinstance(node, Operation):
+                stack.extend((operand, False) for operand in reversed(node.operands))
+
+    def evaluate_dag(
+        self, values: Mapping[str, ArrayLike], dtype: DTypeLike = None
+    ) -> NDArray[Any]:
+        """Evaluates the node like `evaluate`, computing shared subtrees once.
+
+        See `symgraph.evaluator.evaluate_dag`.
+        """
+        from symgraph.evaluator import evaluate_dag
+
+        return evaluate_dag(self, values, dtype)
+
+    def evaluate_numexpr(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
+        """Evaluates the node blockwise with numexpr.
+
+        See `symgraph.compile.evaluate_numexpr`.
+        """
+        from symgraph.compile import evaluate_numexpr
+
+        return evaluate_numexpr(self, values)
+
+    def to_numexpr_str(self) -> str:
+        """Returns the node as a numexpr expression over its symbol names.
+
+        See `symgraph.compile.numexpr_source`.
+        """
+        from symgraph.compile import numexpr_source
+
+        return numexpr_source(self)[0]
+
+    def evaluate_batch(
+        self, values_batch: Mapping[str, ArrayLike], dtype: DTypeLike = None
+    ) -> NDArray[Any]:
+        """Evaluates the node for a batch of draws along the leading axis.
+
+        See `symgraph.evaluator.evaluate_batch`.
+        """
+        from symgraph.evaluator import evaluate_batch
+
+        return evaluate_batch(self, values_batch, dtype)
+
+    def grad(self, wrt: Sequence[Symbol]) -> list[Node]:
+        """Returns the derivatives of the node with respect to each of `wrt`.
+
+        See `symgraph.differentiator.gradient`.
+        """
+        from symgraph.differentiator import gradient
+
+        return gradient(self, wrt)
+
     def to_latex(self) -> str:
         """Converts the node to LaTeX representation.
 
@@ -51,200 +217,572 @@ class Node:
         """
         raise NotImplementedError("to_latex not implemented for this node type")
 
-    def _colorize(self, text: str, level: int) -> str:
-        """Apply color based on the node's level in the tree."""
-        color = COLORS[level % len(COLORS)]  # Cycle through the 6 colors
-        return f"{color}{text}{RESET_COLOR}"
+    def compile(
+        self,
+        variables: Sequence[str] | None = None,
+        backend: str = "numba",
+        dtype: DTypeLike = None,
+    ) -> Callable[..., NDArray[Any]]:
+        """Compiles the node into a function of one array per variable.
 
-    def __str__(self) -> str:
-        """Returns string representation of the node."""
-        return self._str_with_indent(0)
-
-    def _str_with_indent(self, level: int) -> str:
-        """Creates indented string representation for pretty printing.
+        See `symgraph.compile.compile_ufunc`, `compile_numpy`, `compile_jax`
+        and `compile_numexpr`. The function is cached on the node, so
+        compiling it again with the same arguments skips emitting the source.
 
         Args:
-            level: Current indentation level.
+            variables: Parameter order of the function. Defaults to the names
+                of the node's symbols, sorted alphabetically.
+            backend: `"numba"` for a fused ufunc, `"numexpr"` for a blockwise
+                numexpr evaluation, `"numpy"` or `"jax"`.
+            dtype: Optional dtype, e.g. `np.float32`, to compute in.
+
+        Returns:
+            The compiled function.
+        """
+        from symgraph.compile import (
+            compile_jax,
+            compile_numexpr,
+            compile_numpy,
+            compile_ufunc,
+        )
+
+        backends = {
+            "numba": compile_ufunc,
+            "numexpr": compile_numexpr,
+            "numpy": compile_numpy,
+            "jax": compile_jax,
+        }
+        if backend not in backends:
+            raise ValueError(f"Unknown backend {backend!r}")
+        key = (
+            backend,
+            None if variables is None else tuple(variables),
+            None if dtype is None else np.dtype(dtype),
+        )
+        # Only operations are cached: leaves are cheap to compile, and equal
+        # ones such as Constant(2) and Constant(2.0) would share one entry
+        functions = _COMPILED.get(self) if isinstance(self, Operation) else None
+        if functions is not None and key in functions:
+            return functions[key]
+        function = backends[backend](self, variables, dtype)
+        if isinstance(self, Operation):
+            _COMPILED.setdefault(self, {})[key] = function
+        return function
+
+    def to_flat(self) -> tuple[ExprArena, int]:
+        """Stores the node in a new struct-of-arrays `ExprArena`.
+
+        Returns:
+            The arena and the row of this node in it.
         """
+        from symgraph.arena import ExprArena
+
+        arena = ExprArena()
+        return arena, arena.intern_node(self)
+
+    def simplify(self) -> Node:
+        """Returns the node with constants folded and identities removed.
+
+        See `symgraph.rewriter.simplify`.
+        """
+        from symgraph.rewriter import simplify
+
+        return simplify(self)
+
+    def cse(self) -> Node:
+        """Returns the node with structurally identical subtrees merged.
+
+        See `symgraph.rewriter.cse`.
+        """
+        from symgraph.rewriter import cse
+
+        return cse(self)
+
+    def __repr__(self) -> str:
+        # Constant-size, unlike a repr recursing through a shared DAG
+        return f"<{type(self).__name__} at {id(self):#x}>"
+
+    def __str__(self) -> str:
+        """Returns string representation of the node.
+
+        The tree is written iteratively, one line per node indented by its
+        depth, so printing is linear in the size of the tree and deep trees
+        do not hit the recursion limit.
+        """
+        out = io.StringIO()
+        # Pending nodes with their level, and separators to write verbatim
+        stack: list[tuple[Node, int] | str] = [(self, 0)]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                out.write(item)
+                continue
+            node, level = item
+            if level >= len(_LINE_PREFIXES):
+                _LINE_PREFIXES.extend(
+                    map(_line_prefix, range(len(_LINE_PREFIXES), level + 1))
+                )
+            out.write(_LINE_PREFIXES[level])
+            out.write(node._label())
+            if not isinstance(node, Operation):
+                out.write(RESET_COLOR)
+                continue
+            out.write("\n" + RESET_COLOR)
+            if node._STR_TRAILER:
+                stack.append(node._STR_TRAILER)
+            # Pushed in reverse so the first operand is written first
+            for i, operand in enumerate(reversed(node.operands)):
+                if i:
+                    stack.append("\n")
+                stack.append((operand, level + 1))
+        return out.getvalue()
+
+    def _label(self) -> str:
+        """Returns the text of the node's own line when pretty printing."""
         raise NotImplementedError(f"Not implemented for {type(self)}")
 
-    @override
-    def __eq__(self, other: object) -> bool:
-        """Compare the node with another Constant or numeric."""
-        if isinstance(self, Constant):
-            if isinstance(other, int):
-                return self.value == other
-            elif isinstance(other, Constant):
-                return self.value == other.value
-        return id(self) == id(other)
+    def is_zero(self) -> bool:
+        """Returns whether the node is the constant 0."""
+        return False
+
+    def is_one(self) -> bool:
+        """Returns whether the node is the constant 1."""
+        return False
+
+    # The operators build through the smart constructors defined below, so
+    # constant operands are folded and identities such as `x + 0`, `x * 1`
+    # and `x ** 1` dropped as the expression is written
 
     def __add__(self, other: Node | float) -> Node:
         """Addition operator implementation."""
-        if isinstance(other, (int, float)):
-            other = Constant(value=other)
-        return Add(left=self, right=other)
+        return add(self, _as_node(other))
 
     def __radd__(self, other: float) -> Node:
         """Reverse addition operator implementation."""
-        return Constant(value=other) + self
+        return add(_as_node(other), self)
 
     def __sub__(self, other: Node | float) -> Node:
         """Subtraction operator implementation."""
-        if isinstance(other, (int, float)):
-            other = Constant(value=other)
-        return Subtract(left=self, right=other)
+        return sub(self, _as_node(other))
 
     def __rsub__(self, other: float) -> Node:
         """Reverse subtraction operator implementation."""
-        return Constant(value=other) - self
+        return sub(_as_node(other), self)
 
     def __mul__(self, other: Node | float) -> Node:
         """Multiplication operator implementation."""
-        if self == -1 and other == -1:
-            return Constant(1)
-        if self == -1:
-            return Negation(other)
-        elif other == -1:
-            return Negation(self)
-
-        if isinstance(other, (int, float)):
-            other = Constant(value=other)
-        return Multiply(left=self, right=other)
+        return mul(self, _as_node(other))
 
     def __rmul__(self, other: float) -> Node:
         """Reverse multiplication operator implementation."""
-        return Constant(value=other) * self
+        return mul(_as_node(other), self)
 
     def __truediv__(self, other: Node | float) -> Node:
         """Division operator implementation."""
-        if isinstance(other, (int, float)):
-            other = Constant(value=other)
-        return Divide(left=self, right=other)
+        return div(self, _as_node(other))
 
     def __rtruediv__(self, other: float) -> Node:
         """Reverse division operator implementation."""
-        return Constant(value=other) / self
+        return div(_as_node(other), self)
 
     def __pow__(self, other: Node | float) -> Node:
         """Exponentiation operator implementation."""
-        if isinstance(other, (int, float)):
-            other = Constant(value=other)
-        return Exponentiation(left=self, right=other)
+        return power(self, _as_node(other))
 
     def __rpow__(self, other: float) -> Node:
         """Reverse exponentiation operator implementation."""
-        return Constant(value=other) ** self
+        return power(_as_node(other), self)
 
     def __neg__(self) -> Node:
         """Unary negation operator implementation."""
-        return -1 * self
+        return neg(self)
 
 
+@dataclass(slots=True, eq=False, repr=False)
 class Constant(Node):
+    TAG: ClassVar[int] = TAG_CONST
+    value: float
+    # Read-only 0-d array of `value`, built once and returned by every evaluate
+    _array: NDArray[Any] = field(init=False, repr=False)
+    # `_array` cast to the dtype of the last evaluate that passed one
+    _cast: NDArray[Any] = field(init=False, repr=False)
+
     def __init__(self, value: float):
         self.value = value
+        self._array = self._cast = np.array(value)
+        self._array.flags.writeable = False
+
+    @classmethod
+    @override
+    def _intern(cls, value: float) -> tuple[tuple[Any, ...] | None, tuple]:
+        try:
+            hash(value)
+        except TypeError:  # e.g. an array
+            return None, (value,)
+        if value != value:  # noqa: PLR0124 (also handles ints beyond float range)
+            return None, (value,)  # NaN never compares equal: don't share it
+        if value == 0:
+            # Signed zeros compare equal: key them on their signs as well
+            signs = (math.copysign(1.0, value.real), math.copysign(1.0, value.imag))
+            return (Constant, type(value), value, signs), (value,)
+        return (Constant, type(value), value), (value,)
+
+    @override
+    def evaluate(
+        self, values: Mapping[str, ArrayLike], dtype: DTypeLike = None
+    ) -> NDArray[Any]:
+        if dtype is None or self._array.dtype == dtype:
+            return self._array
+        cast = self._cast
+        if cast.dtype != dtype:
+            cast = self._array.astype(dtype)
+            cast.flags.writeable = False
+            self._cast = cast
+        return cast
 
     @override
-    def evaluate(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
-        return np.array(self.value)
+    def is_zero(self) -> bool:
+        return self.value == 0
+
+    @override
+    def is_one(self) -> bool:
+        return self.value == 1
 
     @override
     def to_latex(self) -> str:
         return str(self.value)
 
     @override
-    def _str_with_indent(self, level: int) -> str:
-        return self._colorize(f"{'    ' * level}{self.value}", level)
+    def __eq__(self, other: object) -> bool:
+        """Compare the constant with another Constant or an integer."""
+        if isinstance(other, Constant):
+            return self.value == other.value
+        if isinstance(other, int):
+            return self.value == other
+        return self is other
+
+    @override
+    def __hash__(self) -> int:
+        # Equal to the hash of an integer it compares equal to
+        return hash(self.value)
+
+    @override
+    def _label(self) -> str:
+        return str(self.value)
+
+    @override
+    def __repr__(self) -> str:
+        return f"Constant({self.value!r})"
 
 
+@dataclass(slots=True, eq=False, repr=False, init=False)
 class SymbolicConstant(Constant):
     """Special symbols like pi and e"""
 
+    symbol: str
+
     def __init__(self, symbol: str, value: float):
+        Constant.__init__(self, value)
         self.symbol = symbol
-        self.value = value
 
+    @classmethod
     @override
-    def evaluate(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
-        return np.array(self.value)
+    def _intern(cls, symbol: str, value: float) -> tuple[tuple[Any, ...] | None, tuple]:
+        return None, (symbol, value)
 
     @override
     def to_latex(self) -> str:
         return self.symbol
 
     @override
-    def _str_with_indent(self, level: int) -> str:
-        return self._colorize(f"{'    ' * level}{self.symbol}", level)
+    def _label(self) -> str:
+        return self.symbol
+
+    @override
+    def __repr__(self) -> str:
+        return f"SymbolicConstant({self.symbol!r}, {self.value!r})"
 
 
 Pi = SymbolicConstant("π", math.pi)
 
+# Shared instances of the constants the differentiator and rewriter produce
+# most often. Constants are never mutated, so they can be reused freely.
+_CONST_CACHE: dict[int, Constant] = {v: Constant(v) for v in range(-4, 5)}
+ZERO = _CONST_CACHE[0]
+ONE = _CONST_CACHE[1]
+NEG_ONE = _CONST_CACHE[-1]
+
+
+def _as_node(value: IntoNode) -> Node:
+    """Like `parse_into_node`, but plain numbers become their shared `const`."""
+    # Exact class checks are cheaper than isinstance with a tuple of types
+    cls = value.__class__
+    if cls is float or cls is int:
+        return const(value)  # type: ignore[arg-type]
+    return parse_into_node(value)
+
+
+def const(value: float) -> Constant:
+    """Return a Constant node for `value`, reusing the shared small integers.
 
+    Args:
+        value: The constant's value.
+
+    Returns:
+        A cached Constant for integers in [-4, 4], otherwise the live Constant
+        previously built for the same value and type, if any.
+    """
+    if type(value) is int:
+        cached = _CONST_CACHE.get(value)
+        if cached is not None:
+            return cached
+    return Constant(value)
+
+
+@dataclass(slots=True, eq=False, repr=False)
 class Symbol(Node):
-    def __init__(self, name: str, symbol: str | None = None):
-        self.name = name
-        self.symbol = symbol
+    TAG: ClassVar[int] = TAG_SYMBOL
+    name: str
+    symbol: str | None = None
 
+    @classmethod
     @override
-    def evaluate(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
+    def _intern(
+        cls, name: str, symbol: str | None = None
+    ) -> tuple[tuple[Any, ...] | None, tuple]:
+        return (Symbol, name, symbol), (name, symbol)
+
+    @override
+    def evaluate(
+        self, values: Mapping[str, ArrayLike], dtype: DTypeLike = None
+    ) -> NDArray[Any]:
         if self.name not in values:
             raise ValueError(f"Value for symbol {self.name} not provided")
-        return np.array(values[self.name])
+        # No copy: arrays passed in are only read
+        return np.asarray(values[self.name], dtype=dtype)
 
     @override
     def to_latex(self) -> str:
         return self.symbol if self.symbol is not None else self.name
 
     @override
-    def _str_with_indent(self, level: int) -> str:
-        return self._colorize(f"{'    ' * level}{self.name}", level)
+    def _label(self) -> str:
+        return self.name
 
     @override
     def __eq__(self, other: object) -> bool:
-        """Compare the node with another Constant or numeric."""
+        """Compare the symbol with another Symbol by name."""
+        if self is other:
+            return True
         if isinstance(other, Symbol):
             return self.name == other.name
         return False
 
+    @override
+    def __hash__(self) -> int:
+        return hash(self.name)
+
+    @override
+    def __repr__(self) -> str:
+        if self.symbol is None:
+            return f"Symbol({self.name!r})"
+        return f"Symbol({self.name!r}, {self.symbol!r})"
+
+
+def symbol(name: str, latex: str | None = None) -> Symbol:
+    """Return the shared Symbol for `name`, creating it on first use.
+
+    Equivalent to `Symbol(name, latex)`, which is interned like every node.
+
+    Args:
+        name: Name of the symbol, used to look up its value in `evaluate`.
+        latex: Optional LaTeX representation of the symbol.
+
+    Returns:
+        The live Symbol with this name and LaTeX representation.
+    """
+    return Symbol(name, latex)
+
+
+# Per evaluated operation, the steps of `Operation.evaluate` for the nodes
+# below it: each node with the positions of its operands' results (None for
+# leaves) and the positions whose last use it is, followed by the positions of
+# the root's own operands. The root is left out of the steps so that its plan
+# does not keep the weak key alive.
+type _Step = tuple[Node, tuple[int, ...] | None, tuple[int, ...]]
+type _Plan = tuple[list[_Step], tuple[int, ...]]
+_EVALUATION_PLANS: WeakKeyDictionary[Node, _Plan] = WeakKeyDictionary()
+
+
+# Per evaluated operation, the function compiled from it and the leaves whose
+# values are its arguments
+_EVALUATION_FUNCTIONS: WeakKeyDictionary[
+    Node, tuple[Callable[..., Any], tuple[Node, ...]]
+] = WeakKeyDictionary()
+
+
+def _evaluation_function(
+    root: Operation,
+) -> tuple[Callable[..., Any], tuple[Node, ...]] | None:
+    from symgraph.compile import evaluation_function
+
+    try:
+        return evaluation_function(root)
+    except NotImplementedError:
+        return None
+
+
+def _evaluation_plan(root: Operation) -> _Plan:
+    order = list(root.postorder())[:-1]
+    position = {id(node): i for i, node in enumerate(order)}
+    args: list[tuple[int, ...] | None] = [
+        tuple(position[id(op)] for op in node.operands)
+        if isinstance(node, Operation)
+        else None
+        for node in order
+    ]
+    last_use: dict[int, int] = {}
+    for i, operands in enumerate(args):
+        for j in operands or ():
+            last_use[j] = i
+    roots = tuple(position[id(op)] for op in root.operands)
+    for j in roots:
+        last_use.pop(j, None)  # still needed by the root
+    release: list[list[int]] = [[] for _ in order]
+    for j, i in last_use.items():
+        release[i].append(j)
+    steps = [(node, a, tuple(r)) for node, a, r in zip(order, args, release)]
+    return steps, roots
+
 
 class Operation(Node):
+    __slots__ = ()
+    # Written after the operands when pretty printing
+    _STR_TRAILER: ClassVar[str] = ""
+
     @property
-    def operands(self) -> list[Node]:
+    def operands(self) -> tuple[Node, ...]:
         raise NotImplementedError(f"Not implemented for {type(self)}")
 
-    @operands.setter
-    def operands(self, new_operands: list[IntoNode]) -> None:
+    def __iter__(self) -> Iterator[Node]:
+        """Iterates over the operands without building a tuple."""
+        return iter(self.operands)
+
+    def with_operands(self, operands: Iterable[IntoNode]) -> Node:
+        """Returns a node of the same type over `operands`; `self` is unchanged."""
+        return type(self)(*operands)
+
+    @override
+    def __repr__(self) -> str:
+        """Returns the type and operands, abbreviating operands that are operations.
+
+        So the repr of a deep or shared expression stays short; `str` writes
+        out the whole tree.
+        """
+        operands = ", ".join(
+            Node.__repr__(op) if isinstance(op, Operation) else repr(op)
+            for op in self.operands
+        )
+        return f"{type(self).__name__}({operands})"
+
+    @override
+    def evaluate(
+        self, values: Mapping[str, ArrayLike], dtype: DTypeLike = None
+    ) -> NDArray[Any]:
+        # The tree is compiled once into straight-line numpy code over its
+        # leaves, see `symgraph.compile.evaluation_function`
+        compiled = _EVALUATION_FUNCTIONS.get(self)
+        if compiled is None and self not in _EVALUATION_PLANS:
+            compiled = _evaluation_function(self)
+            if compiled is None:
+                _EVALUATION_PLANS[self] = _evaluation_plan(self)
+            else:
+                _EVALUATION_FUNCTIONS[self] = compiled
+        if compiled is not None:
+            function, leaves = compiled
+            return function(*[leaf.evaluate(values, dtype) for leaf in leaves])
+        # Operations that cannot be compiled are walked instead: each distinct
+        # node is computed once, in post-order, from the results of its
+        # operands, and a result is dropped after its last use.
+        steps, roots = _EVALUATION_PLANS[self]
+        results: list[Any] = [None] * len(steps)
+        for i, (node, args, release) in enumerate(steps):
+            if args is None:
+                results[i] = node.evaluate(values, dtype)
+            else:
+                results[i] = node._compute(*[results[j] for j in args])
+            for j in release:
+                results[j] = None
+        return self._compute(*[results[j] for j in roots])
+
+    def _compute(self, *args: NDArray[Any]) -> NDArray[Any]:
+        """Computes the operation from the values of its operands.
+
+        Must not write into `args`, which may be shared with other nodes.
+        """
         raise NotImplementedError(f"Not implemented for {type(self)}")
 
+    @override
+    def to_latex(self) -> str:
+        # Nodes are immutable, so the LaTeX of an operation rendered before
+        # is reused, for the operation itself or as a subtree of this one
+        cached = _LATEX.get(self)
+        if cached is not None:
+            return cached
+        latex: dict[int, str] = {}
+        stack: list[tuple[Node, bool]] = [(self, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                latex[id(node)] = node._latex(*[latex[id(op)] for op in node.operands])
+                continue
+            if id(node) in latex:
+                continue
+            if not isinstance(node, Operation):
+                latex[id(node)] = node.to_latex()
+            elif (cached := _LATEX.get(node)) is not None:
+                latex[id(node)] = cached
+            else:
+                stack.append((node, True))
+                stack.extend((operand, False) for operand in reversed(node.operands))
+        result = _LATEX[self] = latex[id(self)]
+        return result
 
-class MonoOperation(Operation):
-    def __init__(self, operand: IntoNode):
-        self.operand = parse_into_node(operand)
+    def _latex(self, *args: str) -> str:
+        """Returns the LaTeX of the operation given that of its operands."""
+        raise NotImplementedError("to_latex not implemented for this node type")
 
-    @property
     @override
-    def operands(self) -> list[Node]:
-        return [self.operand]
+    def _label(self) -> str:
+        return type(self).__name__
+
+
+@dataclass(slots=True, eq=False, repr=False)
+class MonoOperation(Operation):
+    operand: Node
+    operands: tuple[Node, ...] = field(init=False, repr=False)
 
-    @operands.setter
-    def operands(self, new_operands: list[IntoNode]) -> None:
-        self.operand = parse_into_node(new_operands[0])
+    def __init__(self, operand: Node):
+        self.operand = operand
+        self.operands = (operand,)
 
+    @classmethod
     @override
-    def _str_with_indent(self, level: int) -> str:
-        result = self._colorize(f"{'    ' * level}{type(self).__name__}\n", level)
-        result += self.operand._str_with_indent(level + 1)
-        return result
+    def _intern(cls, operand: IntoNode) -> tuple[tuple[Any, ...] | None, tuple]:
+        operand = parse_into_node(operand)
+        return (cls, id(operand)), (operand,)
 
 
 class Negation(MonoOperation):
+    __slots__ = ()
+    TAG = TAG_NEG
+
     @override
-    def evaluate(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
-        return -self.operand.evaluate(values)
+    def _compute(self, operand: NDArray[Any]) -> NDArray[Any]:
+        return -operand
 
     @override
-    def to_latex(self) -> str:
-        operand = self.operand.to_latex()
+    def _latex(self, operand: str) -> str:
         base = (
             f"({operand})"
             if isinstance(self.operand, Operation)
@@ -254,94 +792,127 @@ class Negation(MonoOperation):
         return f"-{base}"
 
 
+@dataclass(slots=True, eq=False, repr=False)
 class BinaryOperation(Operation):
-    def __init__(self, left: IntoNode, right: IntoNode):
-        self.left = parse_into_node(left)
-        self.right = parse_into_node(right)
-
-    @property
-    @override
-    def operands(self) -> list[Node]:
-        return [self.left, self.right]
+    left: Node
+    right: Node
+    operands: tuple[Node, ...] = field(init=False, repr=False)
 
-    @operands.setter
-    def operands(self, new_operands: list[IntoNode]) -> None:
-        self.left, self.right = [parse_into_node(operand) for operand in new_operands]
+    def __init__(self, left: Node, right: Node):
+        self.left = left
+        self.right = right
+        self.operands = (left, right)
 
+    @classmethod
     @override
-    def _str_with_indent(self, level: int) -> str:
-        result = self._colorize(f"{'    ' * level}{type(self).__name__}\n", level)
-        result += self.left._str_with_indent(level + 1) + "\n"
-        result += self.right._str_with_indent(level + 1)
-        return result
+    def _intern(
+        cls, left: IntoNode, right: IntoNode
+    ) -> tuple[tuple[Any, ...] | None, tuple]:
+        left, right = parse_into_node(left), parse_into_node(right)
+        return (cls, id(left), id(right)), (left, right)
 
 
+@dataclass(slots=True, eq=False, repr=False)
 class UnaryOperation(Operation):
-    def __init__(self, operand: IntoNode):
-        self.operand: Node = parse_into_node(operand)
-
-    @override
-    def evaluate(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
-        raise NotImplementedError
-
-    @property
-    @override
-    def operands(self) -> list[Node]:
-        self.operand
-        return [self.operand]
+    operand: Node
+    operands: tuple[Node, ...] = field(init=False, repr=False)
+    _STR_TRAILER: ClassVar[str] = "\n"
 
-    @operands.setter
-    def operands(self, new_operands: list[IntoNode]):
-        self.operand = parse_into_node(new_operands[0])
+    def __init__(self, operand: Node):
+        self.operand = operand
+        self.operands = (operand,)
 
+    @classmethod
     @override
-    def _str_with_indent(self, level: int) -> str:
-        result = self._colorize(f"{'    ' * level}{type(self).__name__}\n", level)
-        result += self.operand._str_with_indent(level + 1) + "\n"
-        return result
+    def _intern(cls, operand: IntoNode) -> tuple[tuple[Any, ...] | None, tuple]:
+        operand = parse_into_node(operand)
+        return (cls, id(operand)), (operand,)
 
 
 class Add(BinaryOperation):
+    __slots__ = ()
+    TAG = TAG_ADD
+
     @override
-    def evaluate(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
-        return self.left.evaluate(values) + self.right.evaluate(values)
+    def _compute(self, left: NDArray[Any], right: NDArray[Any]) -> NDArray[Any]:
+        return left + right
 
     @override
-    def to_latex(self) -> str:
-        return f"{self.left.to_latex()} + {self.right.to_latex()}"
+    def _latex(self, left: str, right: str) -> str:
+        return f"{left} + {right}"
 
 
 class Subtract(BinaryOperation):
+    __slots__ = ()
+    TAG = TAG_SUB
+
     @override
-    def evaluate(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
-        return self.left.evaluate(values) - self.right.evaluate(values)
+    def _compute(self, left: NDArray[Any], right: NDArray[Any]) -> NDArray[Any]:
+        return left - right
 
     @override
-    def to_latex(self) -> str:
-        return f"{self.left.to_latex()} - {self.right.to_latex()}"
+    def _latex(self, left: str, right: str) -> str:
+        return f"{left} - {right}"
 
 
 class Multiply(BinaryOperation):
+    __slots__ = ()
+    TAG = TAG_MUL
+
     @override
-    def evaluate(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
-        return self.left.evaluate(values) * self.right.evaluate(values)
+    def _compute(self, left: NDArray[Any], right: NDArray[Any]) -> NDArray[Any]:
+        return left * right
 
     @override
-    def to_latex(self) -> str:
-        return f"{self.left.to_latex()} \\cdot {self.right.to_latex()}"
+    def _latex(self, left: str, right: str) -> str:
+        return f"{left} \\cdot {right}"
 
 
 class Divide(BinaryOperation):
+    __slots__ = ()
+    TAG = TAG_DIV
+
     @override
-    def evaluate(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
-        return self.left.evaluate(values) / self.right.evaluate(values)
+    def _compute(self, left: NDArray[Any], right: NDArray[Any]) -> NDArray[Any]:
+        return left / right
 
     @override
-    def to_latex(self) -> str:
-        return f"\\frac{{{self.left.to_latex()}}}{{{self.right.to_latex()}}}"
+    def _latex(self, left: str, right: str) -> str:
+        return f"\\frac{{{left}}}{{{right}}}"
+
+
+def _cube(x: NDArray[Any]) -> NDArray[Any]:
+    return x * x * x
+
+
+def _inverse_square(x: NDArray[Any]) -> NDArray[Any]:
+    return np.reciprocal(x * x)
+
+
+# Small integer exponents of float bases evaluated with multiplications
+# instead of the general `pow`, which goes through exp/log for most exponents.
+# Integer bases keep the `**` semantics (and errors) of numpy.
+_INTEGER_POWERS: dict[float, Callable[[NDArray[Any]], NDArray[Any]]] = {
+    2: np.square,
+    3: _cube,
+    -1: np.reciprocal,
+    -2: _inverse_square,
+}
+
+
+def constant_power(base: NDArray[Any], exponent: NDArray[Any], value: Any) -> Any:
+    """Computes `base ** exponent` for an exponent that is the constant `value`."""
+    if base.dtype.kind in "fc":
+        specialized = _INTEGER_POWERS.get(value)
+        if specialized is not None:
+            return specialized(base)
+    return base**exponent
 
 
 class Exponentiation(BinaryOperation):
+    __slots__ = ()
+    TAG = TAG_POW
+
     @property
     def base(self):
         return self.left
@@ -351,42 +922,301 @@ class Exponentiation(BinaryOperation):
         return self.right
 
     @override
-    def evaluate(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
-        return self.base.evaluate(values) ** self.exponent.evaluate(values)
+    def _compute(self, base: NDArray[Any], exponent: NDArray[Any]) -> NDArray[Any]:
+        if isinstance(self.exponent, Constant):
+            return constant_power(base, exponent, self.exponent.value)
+        return base**exponent
 
     @override
-    def to_latex(self) -> str:
-        base = self.base.to_latex()
-        base = f"({base})" if isinstance(self.base, Operation) else f"{base}"
-        exp = f"{{{self.exponent.to_latex()}}}"
-        return f"{base}^{exp}"
+    def _latex(self, base: str, exponent: str) -> str:
+        if isinstance(self.base, Operation):
+            base = f"({base})"
+        return f"{base}^{{{exponent}}}"
 
 
 class Sqrt(UnaryOperation):
+    __slots__ = ()
+    TAG = TAG_SQRT
+
     @override
-    def evaluate(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
-        return np.sqrt(self.operand.evaluate(values))
+    def _compute(self, operand: NDArray[Any]) -> NDArray[Any]:
+        return np.sqrt(operand)
 
     @override
-    def to_latex(self) -> str:
-        return f"\\sqrt{{{self.operand.to_latex()}}}"
+    def _latex(self, operand: str) -> str:
+        return f"\\sqrt{{{operand}}}"
 
 
 class Exp(UnaryOperation):
+    __slots__ = ()
+    TAG = TAG_EXP
+
     @override
-    def evaluate(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
-        return np.exp(self.operand.evaluate(values))
+    def _compute(self, operand: NDArray[Any]) -> NDArray[Any]:
+        return np.exp(operand)
 
     @override
-    def to_latex(self) -> str:
-        return f"e^{{{self.operand.to_latex()}}}"
+    def _latex(self, operand: str) -> str:
+        return f"e^{{{operand}}}"
 
 
 class Ln(UnaryOperation):
+    __slots__ = ()
+    TAG = TAG_LN
+
     @override
-    def evaluate(self, values: Mapping[str, ArrayLike]) -> NDArray[Any]:
-        return np.log(self.operand.evaluate(values))
+    def _compute(self, operand: NDArray[Any]) -> NDArray[Any]:
+        return np.log(operand)
 
     @override
-    def to_latex(self) -> str:
-        return f"\\ln({self.operand.to_latex()})"
+    def _latex(self, operand: str) -> str:
+        return f"\\ln({operand})"
+
+
+class Abs(UnaryOperation):
+    __slots__ = ()
+    TAG = TAG_ABS
+
+    @override
+    def _compute(self, operand: NDArray[Any]) -> NDArray[Any]:
+        return np.abs(operand)
+
+    @override
+    def _latex(self, operand: str) -> str:
+        return f"\\left|{operand}\\right|"
+
+
+@dataclass(slots=True, eq=False, repr=False)
+class NaryOperation(Operation):
+    """An associative operation over any number of operands.
+
+    Flattening chains like `((a + b) + c) + d` into one node lets passes
+    iterate over the operands instead of descending through nested binary
+    nodes. See `symgraph.rewriter.normalize`.
+    """
+
+    operands: tuple[Node, ...]
+
+    def __init__(self, operands: tuple[Node, ...]):
+        self.operands = operands
+
+    @classmethod
+    @override
+    def _intern(
+        cls, operands: Iterable[IntoNode]
+    ) -> tuple[tuple[Any, ...] | None, tuple]:
+        nodes = tuple(parse_into_node(operand) for operand in operands)
+        return (cls, *map(id, nodes)), (nodes,)
+
+    @override
+    def with_operands(self, operands: Iterable[IntoNode]) -> Node:
+        return type(self)(operands)
+
+
+class NaryAdd(NaryOperation):
+    __slots__ = ()
+    TAG = TAG_NARY_ADD
+
+    @override
+    def _compute(self, *args: NDArray[Any]) -> NDArray[Any]:
+        if len(args) == 1:
+            # A copy: the operand may be the caller's array, written into later
+            return np.positive(args[0])
+        result = args[0]
+        for arg in args[1:]:
+            result = result + arg
+        return result
+
+    @override
+    def _latex(self, *args: str) -> str:
+        return " + ".join(args)
+
+
+class NaryMul(NaryOperation):
+    __slots__ = ()
+    TAG = TAG_NARY_MUL
+
+    @override
+    def _compute(self, *args: NDArray[Any]) -> NDArray[Any]:
+        if len(args) == 1:
+            return np.positive(args[0])  # a copy, as for NaryAdd
+        result = args[0]
+        for arg in args[1:]:
+            result = result * arg
+        return result
+
+    @override
+    def _latex(self, *args: str) -> str:
+        return " \\cdot ".join(args)
+
+
+def multiply_add(
+    left: NDArray[Any], right: NDArray[Any], addend: NDArray[Any]
+) -> NDArray[Any]:
+    """Computes `left * right + addend`, adding into the product's buffer if possible."""
+    product = np.multiply(left, right)
+    if (
+        product.ndim
+        and product.shape == np.broadcast_shapes(product.shape, addend.shape)
+        and np.result_type(product, addend) == product.dtype
+    ):
+        return np.add(product, addend, out=product)
+    return product + addend
+
+
+@dataclass(slots=True, eq=False, repr=False)
+class MulAdd(Operation):
+    """Fused `left * right + addend`, produced by `symgraph.rewriter.fuse_multiply_add`.
+
+    Evaluating it writes the sum into the array holding the product, so one
+    temporary array is allocated instead of two.
+    """
+
+    TAG: ClassVar[int] = TAG_MULADD
+    left: Node
+    right: Node
+    addend: Node
+    operands: tuple[Node, ...] = field(init=False, repr=False)
+
+    def __init__(self, left: Node, right: Node, addend: Node):
+        self.left = left
+        self.right = right
+        self.addend = addend
+        self.operands = (left, right, addend)
+
+    @classmethod
+    @override
+    def _intern(
+        cls, left: IntoNode, right: IntoNode, addend: IntoNode
+    ) -> tuple[tuple[Any, ...] | None, tuple]:
+        nodes = tuple(map(parse_into_node, (left, right, addend)))
+        return (cls, *map(id, nodes)), nodes
+
+    @override
+    def _compute(
+        self, left: NDArray[Any], right: NDArray[Any], addend: NDArray[Any]
+    ) -> NDArray[Any]:
+        return multiply_add(left, right, addend)
+
+    @override
+    def _latex(self, left: str, right: str, addend: str) -> str:
+        return f"{left} \\cdot {right} + {addend}"
+
+
+# Smart constructors. These fold constants and the additive/multiplicative
+# identities at construction time, so callers that generate expressions (such
+# as the differentiator) never materialise trivial subtrees like `0 * x`.
+# SymbolicConstants are kept symbolic rather than folded into their value.
+
+
+def _is_number(node: Node) -> bool:
+    return type(node) is Constant
+
+
+def _is_value(node: Node, value: float) -> bool:
+    return isinstance(node, Constant) and node.value == value
+
+
+def add(left: Node, right: Node) -> Node:
+    """Build `left + right`, folding constants and dropping zero terms."""
+    if _is_number(left) and _is_number(right):
+        return const(left.value + right.value)
+    if left.is_zero():
+        return right
+    if right.is_zero():
+        return left
+    return Add(left, right)
+
+
+def sub(left: Node, right: Node) -> Node:
+    """Build `left - right`, folding constants and dropping zero terms."""
+    if _is_number(left) and _is_number(right):
+        return const(left.value - right.value)
+    if right.is_zero():
+        return left
+    if left.is_zero():
+        return neg(right)
+    return Subtract(left, right)
+
+
+def mul(left: Node, right: Node) -> Node:
+    """Build `left * right`, folding constants, zeros and ones."""
+    if _is_number(left) and _is_number(right):
+        return const(left.value * right.value)
+    if left.is_zero() or right.is_zero():
+        return ZERO
+    if left.is_one():
+        return right
+    if right.is_one():
+        return left
+    if _is_value(left, -1):
+        return neg(right)
+    if _is_value(right, -1):
+        return neg(left)
+    return Multiply(left, right)
+
+
+def div(left: Node, right: Node) -> Node:
+    """Build `left / right`, folding constants, `0 / x` and `x / 1`."""
+    if _is_number(left) and _is_number(right) and right.value != 0:
+        return const(left.value / right.value)
+    if left.is_zero():
+        return ZERO
+    if right.is_one():
+        return left
+    return Divide(left, right)
+
+
+def power(base: Node, exponent: Node) -> Node:
+    """Build `base ** exponent`, folding `x ** 0`, `x ** 1` and real constants."""
+    if exponent.is_zero():
+        return ONE
+    if exponent.is_one():
+        return base
+    if _is_number(base) and _is_number(exponent):
+        try:
+            value = base.value**exponent.value
+        except (ZeroDivisionError, OverflowError):
+            value = None
+        if isinstance(value, (int, float)):
+            return const(value)
+    return Exponentiation(base, exponent)
+
+
+def neg(operand: Node) -> Node:
+    """Build `-operand`, folding constants and double negation."""
+    if _is_number(operand):
+        return const(-operand.value)
+    if isinstance(operand, Negation):
+        return operand.operand
+    return Negation(operand)
+
+
+def nary_add(operands: Iterable[Node]) -> Node:
+    """Build the sum of `operands`, folding all plain constants into one term."""
+    total: float = 0
+    terms: list[Node] = []
+    for operand in operands:
+        if _is_number(operand):
+            total += operand.value
+        else:
+            terms.append(operand)
+    if total != 0 or not terms:
+        terms.append(const(total))
+    return terms[0] if len(terms) == 1 else NaryAdd(terms)
+
+
+def nary_mul(operands: Iterable[Node]) -> Node:
+    """Build the product of `operands`, folding all plain constants into one factor."""
+    product: float = 1
+    factors: list[Node] = []
+    for operand in operands:
+        if _is_number(operand):
+            product *= operand.value
+        else:
+            factors.append(operand)
+    if product == 0:
+        return ZERO
+    if product != 1 or not factors:
+        factors.insert(0, const(product))
+    return factors[0] if len(factors) == 1 else NaryMul(factors)
@@ -1,10 +1,12 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
+from weakref import WeakSet
 
 
 @dataclass
 class ModelContexts:
-    contexts: set[Model] = field(default_factory=set)
+    # Weak, so that models that are no longer used are not kept alive
+    contexts: WeakSet[Model] = field(default_factory=WeakSet)
     active_contexts: list[Model] = field(default_factory=list)
 
     @property
@@ -26,9 +28,6 @@ class Dist:
     name: str = "dist"
     params: list[Param] = []
 
-    def __init__(self):
-        print("init")
-
 
 class Model:
     parent: Model | None = None
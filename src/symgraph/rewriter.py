@@ -1,157 +1,498 @@
 # rewriter.py
 from symgraph.expression import (
+    ONE,
+    ZERO,
+    Abs,
     Add,
+    BinaryOperation,
     Constant,
     Divide,
     Exp,
     Exponentiation,
     Ln,
+    MulAdd,
     Multiply,
+    NaryAdd,
+    NaryMul,
     Node,
+    Negation,
     Operation,
+    Sqrt,
     Subtract,
+    Symbol,
+    SymbolicConstant,
+    add,
+    div,
+    mul,
+    nary_add,
+    nary_mul,
+    neg,
+    power,
+    sub,
 )
 
 
-from dataclasses import dataclass
-from typing import Callable
+from dataclasses import dataclass, field
+from typing import Any, Callable
+from weakref import WeakKeyDictionary
+
+from symgraph.evaluator import postorder
+
+# A rule takes a node of one of its `applies_to` types, which the rewriter
+# guarantees, and returns its rewritten form or the node itself
+type Rule = Callable[[Any], Node]
+
+
+def applies_to(*node_types: type[Node]) -> Callable[[Rule], Rule]:
+    """Declare the node types a rule can rewrite.
+
+    The rewriter only tries a rule on nodes that are instances of one of
+    `node_types`, so the rule need not check the type of its argument
+    itself; rules without the declaration are tried on every node.
+    """
+
+    def decorate(rule: Rule) -> Rule:
+        rule.node_types = node_types  # type: ignore[attr-defined]
+        return rule
+
+    return decorate
+
+
+# Actions of the `Rewriter` work stack
+_EXPAND, _REWRITE, _RESOLVE = range(3)
 
 
 @dataclass
 class Rewriter:
-    rules: list[Callable[[Node], Node]]
+    rules: list[Rule]
+    # Candidate rules per concrete node type, in the order of `rules`
+    rules_by_type: dict[type[Node], list[Rule]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    # Rewritten form of the expressions given to earlier calls, or None for
+    # those already at a fixpoint (a value must not hold its own key alive)
+    rewritten: WeakKeyDictionary[Node, Node | None] = field(
+        default_factory=WeakKeyDictionary, init=False, repr=False
+    )
+
+    def rules_for(self, node_type: type[Node]) -> list[Rule]:
+        """Return the rules that can apply to nodes of exactly `node_type`."""
+        rules = self.rules_by_type.get(node_type)
+        if rules is None:
+            rules = self.rules_by_type[node_type] = [
+                rule
+                for rule in self.rules
+                if issubclass(node_type, getattr(rule, "node_types", Node))
+            ]
+        return rules
 
     def __call__(self, expression: Node) -> Node:
-        simplified_node = expression
-        while True:
-            new_node = self._apply_rules_recursively(simplified_node)
-            if new_node == simplified_node:
+        """Rewrite `expression` until no rule applies anywhere in it.
+
+        One bottom-up pass: every node is rebuilt from its rewritten
+        operands and then rewritten to a fixpoint of the rules, so each
+        distinct node is visited once. A rule's result is rewritten in turn,
+        as its new subtrees need not be at a fixpoint yet. Nodes are not
+        modified in place, and a node is only rebuilt if an operand changed.
+
+        A rewrite back to a node that is itself still being rewritten, as
+        with a rule and its inverse, is ignored: nodes are interned, so such
+        a cycle returns the same object, and following it would not end.
+
+        Nodes are immutable and interned, so the rewritten form of each
+        expression is remembered, and a later expression containing it, or
+        the same expression again, does not walk it again. The rules should
+        therefore not be changed after the first call.
+        """
+        # Rewritten form of every visited node, keyed by id. Holding the
+        # node itself keeps its id from being reused while the table is
+        # alive. Rewritten forms are at a fixpoint and map to themselves.
+        done: dict[int, tuple[Node, Node]] = {}
+        # Pending work: expand a node, rewrite it once its operands are done,
+        # or resolve it to the rewritten form of a rule's result
+        stack: list[tuple[int, Node, Node | None]] = [(_EXPAND, expression, None)]
+        # Ids of the nodes a rule fired on whose result is not resolved yet
+        rewriting: set[int] = set()
+        # Bound once, as the loop below runs several times per node
+        pop, push, rules_for = stack.pop, stack.append, self.rules_for
+        known = self.rewritten
+        while stack:
+            action, node, target = pop()
+            if action == _RESOLVE:
+                done[id(node)] = (node, done[id(target)][1])
+                rewriting.discard(id(node))
+                continue
+            if id(node) in done:
+                continue
+            if action == _EXPAND:
+                if isinstance(node, Operation):
+                    cached = known.get(node, node)
+                    if cached is not node:
+                        done[id(node)] = (node, node if cached is None else cached)
+                        continue
+                push((_REWRITE, node, None))
+                if isinstance(node, Operation):
+                    for operand in node.operands:
+                        if id(operand) in done:
+                            continue
+                        if isinstance(operand, Operation) or rules_for(type(operand)):
+                            push((_EXPAND, operand, None))
+                        else:
+                            # A leaf no rule applies to is its own rewritten form
+                            done[id(operand)] = (operand, operand)
+                continue
+
+            current = node
+            if isinstance(node, Operation):
+                old = node.operands
+                operands = [done[id(operand)][1] for operand in old]
+                if any(new is not op for new, op in zip(operands, old)):
+                    current = node.with_operands(operands)
+            for rule in rules_for(type(current)):
+                rewritten = rule(current)
+                if rewritten is current or id(rewritten) in rewriting:
+                    continue
+                if id(rewritten) in done:
+                    done[id(node)] = (node, done[id(rewritten)][1])
+                else:
+                    rewriting.update((id(node), id(current)))
+                    push((_RESOLVE, node, rewritten))
+                    if current is not node:
+                        push((_RESOLVE, current, rewritten))
+                    push((_EXPAND, rewritten, None))
                 break
-            simplified_node = new_node
-        return simplified_node
-
-    def _apply_rules_recursively(self, node: Node) -> Node:
-        # First, apply rules to the operands (recursive step)
-        if isinstance(node, Operation):
-            node.operands = [self._apply_rules_recursively(op) for op in node.operands]
-
-        # Now, apply the rules to the current node
-        for rule in self.rules:
-            simplified_node = rule(node)
-            if simplified_node != node:
-                # If a simplification happened, restart to apply all rules on the new simplified node
-                return self._apply_rules_recursively(simplified_node)
-
-        return node
+            else:
+                # The operands are done and no rule fired: this is a fixpoint
+                done[id(node)] = (node, current)
+                done[id(current)] = (current, current)
+        result = done[id(expression)][1]
+        if isinstance(expression, Operation):
+            known[expression] = None if result is expression else result
+        return result
+
+
+@applies_to(Add, Subtract, Multiply, Divide, Exponentiation)
+def simplify_constant_fold(node: BinaryOperation) -> Node:
+    """Fold an operation on two numbers into one: 2 + 3 = 5."""
+    if type(node.left) is Constant and type(node.right) is Constant:
+        # The smart constructors fold, except where the result is no real
+        # number, such as for 1 / 0 or (-1) ** 0.5
+        folded = _SIMPLIFIERS[type(node)](node.left, node.right)
+        if type(folded) is Constant:
+            return folded
+    return node
 
 
-def simplify_multiply_by_zero(node: Node) -> Node:
+@applies_to(Multiply)
+def simplify_multiply_by_zero(node: Multiply) -> Node:
     """Simplify multiplication by zero: x * 0 = 0, 0 * x = 0."""
-    if isinstance(node, Multiply):
-        if node.left == 0 or node.right == 0:
-            return Constant(value=0)
+    if node.left.is_zero() or node.right.is_zero():
+        return ZERO
     return node
 
 
-def simplify_divide_by_zero_numerator(node: Node) -> Node:
+@applies_to(Divide)
+def simplify_divide_by_zero_numerator(node: Divide) -> Node:
     """Simplify dividing zero by anything: 0/x = 0."""
-    if isinstance(node, Divide):
-        if isinstance(node.left, Constant) and node.left.value == 0:
-            return Constant(value=0)
+    if node.left.is_zero():
+        return ZERO
     return node
 
 
-def simplify_multiply_by_one(node: Node) -> Node:
+@applies_to(Multiply)
+def simplify_multiply_by_one(node: Multiply) -> Node:
     """Simplify multiplication by one: x * 1 = x, 1 * x = x."""
-    if isinstance(node, Multiply):
-        if node.left == 1:
-            return node.right
-        if node.right == 1:
-            return node.left
+    if node.left.is_one():
+        return node.right
+    if node.right.is_one():
+        return node.left
     return node
 
 
-def simplify_add_zero(node: Node) -> Node:
+@applies_to(Add)
+def simplify_add_zero(node: Add) -> Node:
     """Simplify addition with zero: x + 0 = x, 0 + x = x."""
-    if isinstance(node, Add):
-        if node.left == 0:
-            return node.right
-        if node.right == 0:
-            return node.left
+    if node.left.is_zero():
+        return node.right
+    if node.right.is_zero():
+        return node.left
     return node
 
 
-def simplify_subtract_zero(node: Node) -> Node:
+@applies_to(Subtract)
+def simplify_subtract_zero(node: Subtract) -> Node:
     """Simplify subtraction of zero: x - 0 = x."""
-    if isinstance(node, Subtract):
-        if node.right == 0:
-            return node.left
+    if node.right.is_zero():
+        return node.left
     return node
 
 
-def simplify_exponentiation(node: Node) -> Node:
+@applies_to(Exponentiation)
+def simplify_exponentiation(node: Exponentiation) -> Node:
     """Simplify exponentiation: x^0 = 1, x^1 = x."""
-    if isinstance(node, Exponentiation):
-        if node.right == 0:
-            return Constant(value=1)
-        if node.right == 1:
-            return node.left
+    if node.right.is_zero():
+        return ONE
+    if node.right.is_one():
+        return node.left
     return node
 
 
-def simplify_fractional_multiplication(node: Node) -> Node:
+@applies_to(Multiply, Divide)
+def simplify_fractional_multiplication(node: Multiply | Divide) -> Node:
     """Simplify expressions like a/a * b = b and b * a/a = b."""
     if isinstance(node, Multiply):
         if isinstance(node.left, Divide) and node.left.left == node.left.right:
             return node.right  # a/a * b = b
         if isinstance(node.right, Divide) and node.right.left == node.right.right:
             return node.left  # b * a/a = b
-    elif isinstance(node, Divide):
-        if node.left == node.right:
-            return Constant(value=1)  # a / a = 1
+    elif node.left == node.right:
+        return ONE  # a / a = 1
     return node
 
 
-def simplify_divide_with_common_factor(node: Node) -> Node:
+@applies_to(Divide)
+def simplify_divide_with_common_factor(node: Divide) -> Node:
     """Simplify expressions like a * b / a = b."""
-    if isinstance(node, Divide):
-        numerator = node.left
-        denominator = node.right
-
-        # If numerator is a multiplication, check for common factors
-        if isinstance(numerator, Multiply):
-            if numerator.left == denominator:
-                return numerator.right  # a * b / a = b
-            if numerator.right == denominator:
-                return numerator.left  # b * a / a = b
+    numerator = node.left
+    denominator = node.right
+
+    # If numerator is a multiplication, check for common factors
+    if isinstance(numerator, Multiply):
+        if numerator.left == denominator:
+            return numerator.right  # a * b / a = b
+        if numerator.right == denominator:
+            return numerator.left  # b * a / a = b
     return node
 
 
-def simplify_ln_of_e_power(node: Node) -> Node:
-    """Simplify subtraction of zero: x - 0 = x."""
-    if isinstance(node, Ln):
-        if isinstance(node.operand, Exp):
-            return node.operand.operand
+@applies_to(Ln)
+def simplify_ln_of_e_power(node: Ln) -> Node:
+    """Simplify the logarithm of a power of e: ln(e^x) = x."""
+    if isinstance(node.operand, Exp):
+        return node.operand.operand
     return node
 
 
-def simplify_e_power_of_ln(node: Node) -> Node:
-    """Simplify subtraction of zero: x - 0 = x."""
-    if isinstance(node, Exp):
-        if isinstance(node.operand, Ln):
-            return node.operand.operand
+@applies_to(Exp)
+def simplify_e_power_of_ln(node: Exp) -> Node:
+    """Simplify e to the power of a logarithm: e^ln(x) = x."""
+    if isinstance(node.operand, Ln):
+        return node.operand.operand
     return node
 
 
-def simplify_ln_of_mul(node: Node) -> Node:
-    if isinstance(node, Ln):
-        mul_node = node.operand
-        if isinstance(mul_node, Multiply):
-            return Ln(mul_node.left) + Ln(mul_node.right)
+@applies_to(Ln)
+def simplify_ln_of_mul(node: Ln) -> Node:
+    """Expand the logarithm of a product: ln(a * b) = ln(a) + ln(b)."""
+    mul_node = node.operand
+    if isinstance(mul_node, Multiply):
+        return Ln(mul_node.left) + Ln(mul_node.right)
     return node
 
 
+# Binary operations folded into each n-ary type, and the constructor producing it
+_FLATTEN: dict[type[Node], tuple[type[Node], Callable[[list[Node]], Node]]] = {
+    Add: (NaryAdd, nary_add),
+    NaryAdd: (NaryAdd, nary_add),
+    Multiply: (NaryMul, nary_mul),
+    NaryMul: (NaryMul, nary_mul),
+}
+
+
+def normalize(root: Node) -> Node:
+    """Flatten chains of Add and Multiply into NaryAdd and NaryMul nodes.
+
+    The tree is walked once in post-order, so a chain is flattened bottom-up:
+    `Add(Add(a, b), c)` becomes `NaryAdd([a, b, c])`. Plain constants within a
+    chain are folded into a single operand, and shared subexpressions are
+    normalized once. The input tree is not modified.
+
+    Args:
+        root: The expression to normalize.
+
+    Returns:
+        The normalized expression.
+    """
+    done: dict[int, Node] = {}
+    stack: list[tuple[Node, bool]] = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if id(node) in done:
+            continue
+        if not isinstance(node, Operation):
+            done[id(node)] = node
+        elif not expanded:
+            stack.append((node, True))
+            stack.extend((operand, False) for operand in node)
+        else:
+            operands = [done[id(operand)] for operand in node]
+            flatten = _FLATTEN.get(type(node))
+            if flatten is None:
+                changed = any(new is not old for new, old in zip(operands, node))
+                done[id(node)] = node.with_operands(operands) if changed else node
+                continue
+            nary_type, build = flatten
+            flat: list[Node] = []
+            for operand in operands:
+                if type(operand) is nary_type:
+                    flat.extend(operand.operands)
+                else:
+                    flat.append(operand)
+            done[id(node)] = build(flat)
+    return done[id(root)]
+
+
+def _simplify_sqrt(operand: Node) -> Node:
+    # sqrt(u^2) = |u| for real u
+    if isinstance(operand, Exponentiation) and operand.exponent == 2:
+        return Abs(operand.base)
+    return Sqrt(operand)
+
+
+# Smart constructor rebuilding each operation type from simplified operands
+_SIMPLIFIERS: dict[type[Node], Callable[..., Node]] = {
+    Add: add,
+    Subtract: sub,
+    Multiply: mul,
+    Divide: div,
+    Exponentiation: power,
+    Negation: neg,
+    Sqrt: _simplify_sqrt,
+    NaryAdd: lambda *operands: nary_add(operands),
+    NaryMul: lambda *operands: nary_mul(operands),
+}
+
+
+def simplify(root: Node) -> Node:
+    """Fold constants and drop identities in a single post-order walk.
+
+    Every operation is rebuilt bottom-up with the smart constructors of
+    `symgraph.expression`, so `Constant(a) + Constant(b)` folds to a constant,
+    `x + 0`, `x * 1` and `x ** 1` reduce to `x` and `x * 0` to `0`. In addition
+    `sqrt(x ** 2)` becomes `|x|`. As the constructors hash-cons their results,
+    equal folded subexpressions end up shared.
+
+    Args:
+        root: The expression to simplify.
+
+    Returns:
+        The simplified expression. The input is not modified.
+    """
+    done: dict[int, Node] = {}
+    for node in postorder(root):
+        if not isinstance(node, Operation):
+            done[id(node)] = node
+            continue
+        operands = [done[id(operand)] for operand in node]
+        build = _SIMPLIFIERS.get(type(node))
+        if build is not None:
+            done[id(node)] = build(*operands)
+        elif any(new is not old for new, old in zip(operands, node)):
+            done[id(node)] = node.with_operands(operands)
+        else:
+            done[id(node)] = node
+    return done[id(root)]
+
+
+# Operations whose value does not depend on the order of their operands
+_COMMUTATIVE: frozenset[type[Node]] = frozenset({Add, Multiply, NaryAdd, NaryMul})
+
+
+def _leaf_key(node: Node) -> tuple[object, ...]:
+    if type(node) is SymbolicConstant:
+        return ("k", node.symbol, node.value)
+    if isinstance(node, Constant):
+        return ("c", type(node.value), node.value)
+    if isinstance(node, Symbol):
+        return ("s", node.name)
+    return ("n", id(node))  # unknown leaves are only equal to themselves
+
+
+def cse(root: Node) -> Node:
+    """Merge structurally identical subtrees into a single shared node.
+
+    Each node is keyed on its type and the canonical nodes of its operands,
+    sorted by identity for commutative operations so that `a + b` and `b + a`
+    share a node. The first node seen with a key becomes its canonical node.
+    The result is a DAG in which every distinct subexpression occurs once, so
+    passes memoized on `id(node)` (like the differentiator) handle each once.
+
+    Args:
+        root: The expression to deduplicate.
+
+    Returns:
+        An equivalent expression with shared subtrees. The input is not modified.
+    """
+    table: dict[tuple[object, ...], Node] = {}
+    canonical: dict[int, Node] = {}
+    stack: list[tuple[Node, bool]] = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if id(node) in canonical:
+            continue
+        if not isinstance(node, Operation):
+            key = _leaf_key(node)
+        elif not expanded:
+            stack.append((node, True))
+            stack.extend((operand, False) for operand in node)
+            continue
+        else:
+            operands = [canonical[id(operand)] for operand in node]
+            ids = [id(operand) for operand in operands]
+            if type(node) in _COMMUTATIVE:
+                ids.sort()
+            key = (type(node), *ids)
+            if key not in table and any(n is not o for n, o in zip(operands, node)):
+                table[key] = node.with_operands(operands)
+        canonical[id(node)] = table.setdefault(key, node)
+    return canonical[id(root)]
+
+
+def fuse_multiply_add(root: Node) -> Node:
+    """Lower `a * b + c` (and `c + a * b`) to fused `MulAdd` nodes.
+
+    A product is only fused when the sum is its single parent: a product used
+    elsewhere is computed anyway, and fusing would compute it twice. Run after
+    `cse`, so that parents are counted on the deduplicated DAG.
+
+    Args:
+        root: The expression to lower.
+
+    Returns:
+        The lowered expression. The input is not modified.
+    """
+    order = postorder(root)
+    parents: dict[int, int] = {}
+    for node in order:
+        for operand in node if isinstance(node, Operation) else ():
+            parents[id(operand)] = parents.get(id(operand), 0) + 1
+
+    def fusable(node: Node) -> bool:
+        return type(node) is Multiply and parents[id(node)] == 1
+
+    done: dict[int, Node] = {}
+    for node in order:
+        if not isinstance(node, Operation):
+            done[id(node)] = node
+            continue
+        operands = [done[id(operand)] for operand in node]
+        if type(node) is Add and (fusable(node.left) or fusable(node.right)):
+            product, addend = (
+                (node.left, node.right)
+                if fusable(node.left)
+                else (node.right, node.left)
+            )
+            left, right = (done[id(operand)] for operand in product)
+            done[id(node)] = MulAdd(left, right, done[id(addend)])
+        elif any(new is not old for new, old in zip(operands, node)):
+            done[id(node)] = node.with_operands(operands)
+        else:
+            done[id(node)] = node
+    return done[id(root)]
+
+
 all_rules = [
+    simplify_constant_fold,
     simplify_multiply_by_zero,
     simplify_multiply_by_one,
     simplify_add_zero,
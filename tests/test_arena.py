@@ -0,0 +1,91 @@
+# test_arena.py
+import numpy as np
+import pytest
+
+from symgraph.arena import TAG_ADD, ExprArena
+from symgraph.differentiator import differentiate_node
+from symgraph.expression import Exp, Ln, Pi, Sqrt, Symbol
+
+
+def test_rows_are_hash_consed():
+    x = Symbol("x")
+    arena = ExprArena()
+    first = arena.intern_node(x + 1)
+    second = arena.intern_node(x + 1)
+    assert first == second
+    assert arena.tag[first] == TAG_ADD
+
+
+def test_round_trip_preserves_value():
+    x, y = Symbol("x"), Symbol("y", symbol="γ")
+    expr = Sqrt(2 * Pi * y**2) / Exp(-((x - y) ** 2)) + Ln(x)
+    arena = ExprArena(capacity=2)
+    rebuilt = arena.to_node(arena.intern_node(expr))
+    values = {"x": 1.5, "y": 0.25}
+    expected = float(expr.evaluate(values))
+    assert float(rebuilt.evaluate(values)) == pytest.approx(expected)
+    assert rebuilt.to_latex() == expr.to_latex()
+
+
+def test_round_trip_keeps_constant_types():
+    x = Symbol("x")
+    arena = ExprArena()
+    for expr in (x**2.0, x**2, x * 1e300 + 3, Exp(x) - 0.0):
+        assert arena.to_node(arena.intern_node(expr)) is expr
+
+
+@pytest.mark.parametrize("name", ["x", "y"])
+def test_differentiate_matches_node_differentiator(name: str):
+    x, y = Symbol("x"), Symbol("y")
+    expr = x**y * Sqrt(x * y) / (1 + Exp(-x)) - Ln(y) * x**3
+    arena = ExprArena()
+    derivative = arena.to_node(arena.differentiate(arena.intern_node(expr), name))
+    expected = differentiate_node(expr, Symbol(name))
+    values = {"x": 0.8, "y": 1.9}
+    assert float(derivative.evaluate(values)) == pytest.approx(
+        float(expected.evaluate(values))
+    )
+
+
+def test_differentiate_constant_is_zero():
+    arena = ExprArena()
+    root = arena.intern_node(Symbol("y") * 3)
+    assert arena.differentiate(root, "x") == arena.zero
+
+
+def test_evaluate_matches_tree():
+    x, y = Symbol("x"), Symbol("y")
+    expr = Sqrt(2 * Pi * y**2) / Exp(-((x - y) ** 2)) + Ln(x)
+    arena, root = expr.to_flat()
+    values = {"x": np.linspace(0.5, 2, 4), "y": 0.25}
+    np.testing.assert_allclose(arena.evaluate(root, values), expr.evaluate(values))
+
+
+def test_evaluate_numba_matches_tree():
+    pytest.importorskip("numba")
+    x, y = Symbol("x"), Symbol("y")
+    expr = Sqrt(2 * Pi * y**2) / Exp(-((x - y) ** 2)) + Ln(x) - x**2.5
+    arena, root = expr.to_flat()
+    # More elements than one block, with a scalar input broadcast against them
+    values = {"x": np.linspace(0.5, 2, 1000).reshape(10, 100), "y": 0.25}
+    result = arena.evaluate_numba(root, values)
+    assert result.shape == (10, 100)
+    np.testing.assert_allclose(result, expr.evaluate(values))
+    with pytest.raises(ValueError):
+        arena.evaluate_numba(root, {"x": 1.0})
+
+
+def test_evaluate_numba_only_uses_reachable_rows():
+    pytest.importorskip("numba")
+    x, y = Symbol("x"), Symbol("y")
+    big = x
+    for i in range(500):
+        big = Exp(big) * (i + 0.5)
+    arena, _ = big.to_flat()
+    root = arena.intern_node(Ln(y) + 1)
+    program = arena._program_of(root)
+    assert len(program[0]) == 4 and len(arena) > 1000
+    values = {"y": np.linspace(0.5, 2, 300)}
+    np.testing.assert_allclose(
+        arena.evaluate_numba(root, values), np.log(values["y"]) + 1
+    )
@@ -0,0 +1,172 @@
+# test_compile.py
+import math
+
+import numpy as np
+import pytest
+
+from symgraph.compile import (
+    compile_expr,
+    compile_numpy,
+    compile_to_numba,
+    cse_source,
+    evaluation_function,
+    evaluation_source,
+    free_symbols,
+    to_source,
+)
+from symgraph.expression import Constant, Exp, MulAdd, Node, Pi, Sqrt, Symbol
+from symgraph.rewriter import normalize
+
+
+def normal_distribution(mu: Node, sigma: Node, x: Node) -> Node:
+    sigma_squared = sigma**2
+    preamble = 1 / Sqrt(Constant(2) * Pi * sigma_squared)
+    exp = Exp(-((x - mu) ** 2) / (2 * sigma_squared))
+    return preamble * exp
+
+
+@pytest.fixture
+def normal():
+    return normal_distribution(Symbol("mu"), Symbol("sigma"), Symbol("x"))
+
+
+def test_free_symbols(normal: Node):
+    assert free_symbols(normal) == ["mu", "sigma", "x"]
+
+
+def test_to_source_evaluates_like_tree(normal: Node):
+    values = {"mu": 0.5, "sigma": 1.3, "x": -0.2}
+    result = eval(to_source(normal), {"math": math}, values)
+    assert result == pytest.approx(float(normal.evaluate(values)))
+
+
+def test_compile_to_numba(normal: Node):
+    pytest.importorskip("numba")
+    kernel = compile_to_numba(normal, [Symbol("x"), "mu", "sigma"])
+    expected = float(normal.evaluate({"mu": 0.5, "sigma": 1.3, "x": -0.2}))
+    assert kernel(-0.2, 0.5, 1.3) == pytest.approx(expected)
+
+
+def test_compile_to_numba_with_signature(normal: Node):
+    pytest.importorskip("numba")
+    kernel = compile_to_numba(normal, signature="float64(float64, float64, float64)")
+    expected = float(normal.evaluate({"mu": 0.5, "sigma": 1.3, "x": -0.2}))
+    assert kernel(0.5, 1.3, -0.2) == pytest.approx(expected)
+
+
+def test_compile_requires_all_symbols(normal: Node):
+    pytest.importorskip("numba")
+    with pytest.raises(ValueError):
+        compile_to_numba(normal, ["x"])
+
+
+def test_to_source_nary(normal: Node):
+    expr = normalize(normal + Symbol("x") * 2)
+    values = {"mu": 0.5, "sigma": 1.3, "x": -0.2}
+    result = eval(to_source(expr), {"math": math}, values)
+    assert result == pytest.approx(float(expr.evaluate(values)))
+
+
+def test_compile_expr_shares_subexpressions(normal: Node):
+    x, mu = Symbol("x"), Symbol("mu")
+    expr = Exp(x - mu) + (x - mu) ** 2
+    source = cse_source(expr, ["mu", "x"])
+    assert source.count("(x - mu)") == 1
+    function = compile_expr(normal)
+    expected = float(normal.evaluate({"mu": 0.5, "sigma": 1.3, "x": -0.2}))
+    assert function(0.5, 1.3, -0.2) == pytest.approx(expected)
+
+
+def test_compile_numpy_evaluates_arrays(normal: Node):
+    x = np.linspace(-1, 1, 6)[:, None]
+    values = {"mu": 0.5, "sigma": np.array([1.3, 0.7]), "x": x}
+    function = compile_numpy(normal)
+    result = function(values["mu"], values["sigma"], values["x"])
+    np.testing.assert_allclose(result, normal.evaluate(values))
+
+
+def test_compiled_functions_are_cached_by_structure():
+    first = Exp(Symbol("x")) * 2
+    second = Exp(Symbol("x")) * 2
+    assert compile_numpy(first) is compile_numpy(second)
+
+
+def test_node_compile_fuses_array_kernel(normal: Node):
+    pytest.importorskip("numba")
+    x = np.linspace(-1, 1, 5)
+    kernel = normal.compile(["x", "mu", "sigma"])
+    np.testing.assert_allclose(
+        kernel(x, 0.5, 1.3), normal.evaluate({"mu": 0.5, "sigma": 1.3, "x": x})
+    )
+
+
+def test_compile_jax_matches_numpy(normal: Node):
+    assert "jnp.exp(" in cse_source(normal, ["x", "mu", "sigma"], module="jnp")
+    pytest.importorskip("jax")
+    x = np.linspace(-1, 1, 5)
+    function = normal.compile(["x", "mu", "sigma"], backend="jax")
+    np.testing.assert_allclose(
+        function(x, 0.5, 1.3),
+        normal.evaluate({"mu": 0.5, "sigma": 1.3, "x": x}),
+        rtol=1e-6,
+    )
+
+
+def test_evaluate_numexpr_matches_tree(normal: Node):
+    assert "exp(" in normal.to_numexpr_str()
+    assert "math." not in normal.to_numexpr_str()
+    pytest.importorskip("numexpr")
+    values = {"mu": 0.5, "sigma": 1.3, "x": np.linspace(-1, 1, 5)}
+    np.testing.assert_allclose(normal.evaluate_numexpr(values), normal.evaluate(values))
+    with pytest.raises(ValueError):
+        normal.evaluate_numexpr({"x": 1.0})
+
+
+def test_node_compile_numexpr_is_cached(normal: Node):
+    pytest.importorskip("numexpr")
+    function = normal.compile(["x", "mu", "sigma"], backend="numexpr")
+    assert normal.compile(["x", "mu", "sigma"], backend="numexpr") is function
+    x = np.linspace(-2.0, 2.0, 11)
+    expected = normal.evaluate({"x": x, "mu": 0.5, "sigma": 1.5})
+    np.testing.assert_allclose(function(x, 0.5, 1.5), expected)
+
+
+def test_evaluation_source_frees_temporaries(normal: Node):
+    source, leaves = evaluation_source(normal)
+    assert "del _t0" in source
+    assert {leaf.name for leaf in leaves if isinstance(leaf, Symbol)} == {
+        "mu",
+        "sigma",
+        "x",
+    }
+    function, _ = evaluation_function(normal)
+    values = {"mu": 0.5, "sigma": 1.3, "x": np.linspace(-1, 1, 5)}
+    np.testing.assert_allclose(
+        function(*[leaf.evaluate(values) for leaf in leaves]),
+        compile_numpy(normal, ["mu", "sigma", "x"])(0.5, 1.3, values["x"]),
+    )
+
+
+def test_evaluation_source_keeps_fast_paths():
+    x, y = Symbol("x"), Symbol("y")
+    expr = MulAdd(x**3, y, x**2.5)
+    source, leaves = evaluation_source(expr)
+    assert "_constant_power(_a0, _a1, 3)" in source
+    assert "_multiply_add(" in source
+    assert "**" in source  # 2.5 has no specialized kernel
+    values = {"x": np.linspace(0.5, 2.0, 5), "y": np.linspace(-1.0, 1.0, 5)}
+    np.testing.assert_allclose(
+        expr.evaluate(values),
+        values["x"] ** 3 * values["y"] + values["x"] ** 2.5,
+    )
+
+
+@pytest.mark.parametrize(
+    "constant", [math.inf, -math.inf, math.nan, np.float64(2.5), np.int64(3)]
+)
+def test_compile_special_constants(constant):
+    x = Symbol("x")
+    expr = x * Constant(constant) + 1
+    expected = float(expr.evaluate({"x": 2.0}))
+    assert compile_expr(expr)(2.0) == pytest.approx(expected, nan_ok=True)
+    np.testing.assert_allclose(compile_numpy(expr)(np.array([2.0])), [expected])
@@ -0,0 +1,204 @@
+# test_differentiator.py
+import math
+
+import pytest
+
+from symgraph.differentiator import (
+    DiffCache,
+    differentiate,
+    differentiate_node,
+    gradient,
+    is_constant_wrt,
+)
+from symgraph.expression import (
+    Abs,
+    Constant,
+    Exp,
+    Ln,
+    MulAdd,
+    Multiply,
+    NaryMul,
+    Node,
+    Pi,
+    Sqrt,
+    Symbol,
+)
+from symgraph.rewriter import cse, normalize
+
+
+def normal_distribution(mu: Node, sigma: Node, x: Node) -> Node:
+    sigma_squared = sigma**2
+    preamble = 1 / Sqrt(2 * Pi * sigma_squared)
+    exp = Exp(-((x - mu) ** 2) / (2 * sigma_squared))
+    return preamble * exp
+
+
+def numeric_derivative(expr: Node, name: str, values: dict[str, float]) -> float:
+    h = 1e-6
+    upper = dict(values, **{name: values[name] + h})
+    lower = dict(values, **{name: values[name] - h})
+    return float((expr.evaluate(upper) - expr.evaluate(lower)) / (2 * h))
+
+
+@pytest.mark.parametrize("name", ["x", "mu", "sigma"])
+def test_normal_distribution_derivative(name: str):
+    mu, sigma, x = Symbol("mu"), Symbol("sigma"), Symbol("x")
+    expr = normal_distribution(mu, sigma, x)
+    values = {"mu": 0.3, "sigma": 1.7, "x": -0.4}
+    derivative = differentiate_node(expr, Symbol(name))
+    assert float(derivative.evaluate(values)) == pytest.approx(
+        numeric_derivative(expr, name, values), rel=1e-6
+    )
+
+
+@pytest.mark.parametrize(
+    "build",
+    [
+        lambda x, y: x * y / (x + y),
+        lambda x, y: x**y,
+        lambda x, y: Ln(x * y) - Exp(-x),
+        lambda x, y: Sqrt(x) * (y - x) ** 3,
+        lambda x, y: y / x + x / y,
+        lambda x, y: x**y + y**x + 2**x,
+    ],
+)
+def test_derivative_matches_numeric(build):
+    x, y = Symbol("x"), Symbol("y")
+    expr = build(x, y)
+    values = {"x": 1.3, "y": 0.7}
+    derivative = differentiate_node(expr, x)
+    assert float(derivative.evaluate(values)) == pytest.approx(
+        numeric_derivative(expr, "x", values), rel=1e-6
+    )
+
+
+def test_shared_subexpression_is_differentiated_once():
+    x = Symbol("x")
+    shared = Exp(x * x)
+    cache = DiffCache()
+    differentiate_node(shared + shared, x, cache)
+    first = cache.derivatives[(id(shared), "x")]
+    assert differentiate_node(shared, x, cache) is first
+
+
+def test_cache_is_shared_across_variables():
+    x, y = Symbol("x"), Symbol("y")
+    expr = Exp(x * y)
+    cache = DiffCache()
+    d_x = differentiate(expr, x, cache)
+    d_y = differentiate(expr, y, cache)
+    assert d_x == differentiate(expr, x)
+    assert d_y == differentiate(expr, y)
+    assert d_x is not d_y
+
+
+def test_rules_share_repeated_operands():
+    x, y = Symbol("x"), Symbol("y")
+    denominator = Ln(x) + y
+    quotient = differentiate_node((Exp(x) * y) / denominator, x)
+    assert quotient.right.base is denominator
+    # Every repeated subexpression of the derivative is a single node
+    derivative = (Exp(x) + y) ** (Sqrt(x) * y)
+    for _ in range(3):
+        derivative = differentiate_node(derivative, x)
+        assert len(list(derivative.postorder())) == len(
+            list(cse(derivative).postorder())
+        )
+
+
+def test_constant_derivative_is_zero():
+    x, y = Symbol("x"), Symbol("y")
+    assert differentiate_node(y * 3 + math.pi, x) == 0
+
+
+def test_constant_factor_skips_product_rule():
+    x, y = Symbol("x"), Symbol("y")
+    derivative = differentiate_node(y * Exp(x), x)
+    assert isinstance(derivative, Multiply)
+    assert derivative.left == y
+
+
+def test_deep_expression_does_not_recurse():
+    x, y = Symbol("x"), Symbol("y")
+    expr = y
+    for _ in range(5000):
+        expr = expr + y
+    assert is_constant_wrt(expr, x)
+    assert not is_constant_wrt(expr * x, x)
+
+
+def test_differentiate_deep_tree_does_not_recurse():
+    x = Symbol("x")
+    expr = x
+    for i in range(3000):
+        expr = Sqrt(expr + 1) if i % 2 else Ln(expr * x + 1)
+    derivative = differentiate(expr, x)
+    assert math.isfinite(derivative.evaluate({"x": 0.5}))
+
+
+def test_differentiate_resolves_dependencies_up_front():
+    x, y = Symbol("x"), Symbol("y")
+    expr = Exp(x * y) + Ln(y) * Sqrt(x)
+    cache = DiffCache()
+    differentiate(expr, x, cache)
+    assert cache.constant["x"][id(expr)] is False
+    assert cache.constant["x"][id(expr.right.left)] is True
+
+
+def test_nary_derivative_matches_binary():
+    x, y = Symbol("x"), Symbol("y")
+    expr = x * y * Exp(x) * 3 + Ln(x) + y + x * x
+    derivative = differentiate_node(normalize(expr), x)
+    expected = differentiate_node(expr, x)
+    values = {"x": 0.7, "y": -1.2}
+    assert float(derivative.evaluate(values)) == pytest.approx(
+        float(expected.evaluate(values))
+    )
+
+
+def test_muladd_derivative():
+    x, y = Symbol("x"), Symbol("y")
+    expr = MulAdd(x, Exp(x), y * x)
+    derivative = differentiate_node(expr, x)
+    expected = differentiate_node(x * Exp(x) + y * x, x)
+    values = {"x": 0.3, "y": 2.0}
+    assert float(derivative.evaluate(values)) == pytest.approx(
+        float(expected.evaluate(values))
+    )
+
+
+@pytest.mark.parametrize(
+    "build",
+    [
+        lambda x, y: x * y / (x + y),
+        lambda x, y: x**y + y**x + 2**x,
+        lambda x, y: Ln(x * y) - Exp(-x) * Sqrt(y),
+        lambda x, y: NaryMul((x, y, x)) + MulAdd(x, y, Abs(x - y)),
+    ],
+)
+def test_gradient_matches_forward_mode(build):
+    x, y, z = Symbol("x"), Symbol("y"), Symbol("z")
+    expr = build(x, y)
+    values = {"x": 1.3, "y": 0.7}
+    grad_x, grad_y, grad_z = gradient(expr, [x, y, z])
+    for var, grad in ((x, grad_x), (y, grad_y)):
+        assert float(grad.evaluate(values)) == pytest.approx(
+            float(differentiate_node(expr, var).evaluate(values)), rel=1e-9
+        )
+    assert grad_z == 0
+
+
+def test_gradient_of_constants_is_zero():
+    x, y = Symbol("x"), Symbol("y")
+    for root in (Constant(3), Pi, y, Exp(y) + Pi):
+        assert gradient(root, [x]) == [0]
+        assert gradient(root, [x])[0] == differentiate(root, x)
+    assert gradient(x, [x, y]) == [1, 0]
+
+
+def test_gradient_shares_primal_nodes():
+    x, y = Symbol("x"), Symbol("y")
+    primal = Exp(x * y)
+    grad_x, grad_y = primal.grad([x, y])
+    assert isinstance(grad_x, Multiply) and grad_x.left is primal
+    assert isinstance(grad_y, Multiply) and grad_y.left is primal
@@ -0,0 +1,155 @@
+# test_evaluator.py
+import numpy as np
+import pytest
+
+from symgraph.differentiator import gradient
+from symgraph.evaluator import evaluate_batch, evaluate_dag, evaluate_many, postorder
+from symgraph.expression import (
+    Constant,
+    Exp,
+    Ln,
+    MulAdd,
+    NaryAdd,
+    NaryMul,
+    Node,
+    Pi,
+    Sqrt,
+    Symbol,
+)
+
+
+def normal_distribution(mu: Node, sigma: Node, x: Node) -> Node:
+    sigma_squared = sigma**2
+    preamble = 1 / Sqrt(Constant(2) * Pi * sigma_squared)
+    exp = Exp(-((x - mu) ** 2) / (2 * sigma_squared))
+    return preamble * exp
+
+
+def test_evaluate_dag_matches_evaluate():
+    expr = normal_distribution(Symbol("mu"), Symbol("sigma"), Symbol("x"))
+    values = {
+        "mu": 0.5,
+        "sigma": np.array([1.3, 0.7]),
+        "x": np.linspace(-1, 1, 8)[:, None],
+    }
+    np.testing.assert_allclose(expr.evaluate_dag(values), expr.evaluate(values))
+
+
+def test_shared_nodes_are_listed_once():
+    x = Symbol("x")
+    shared = Ln(x + 1)
+    expr = shared * shared + NaryAdd([shared, x, Constant(3)])
+    order = postorder(expr)
+    assert len(order) == len({id(node) for node in order})
+    values = {"x": np.arange(1.0, 5.0)}
+    np.testing.assert_allclose(evaluate_dag(expr, values), expr.evaluate(values))
+
+
+def test_deep_expression_does_not_recurse():
+    x = Symbol("x")
+    expr = x
+    for _ in range(5000):
+        expr = expr + 1
+    assert float(evaluate_dag(expr, {"x": 0.5})) == pytest.approx(5000.5)
+
+
+def test_missing_symbol_raises():
+    with pytest.raises(ValueError):
+        evaluate_dag(Symbol("x") + 1, {})
+
+
+def test_evaluate_batch_matches_loop():
+    expr = normal_distribution(Symbol("mu"), Symbol("sigma"), Symbol("x"))
+    rng = np.random.default_rng(0)
+    batch = {
+        "mu": rng.normal(size=5),
+        "sigma": rng.uniform(0.5, 2, size=5),
+        "x": rng.normal(size=(5, 3)),
+    }
+    result = expr.evaluate_batch(batch)
+    assert result.shape == (5, 3)
+    for i in range(5):
+        draw = {name: value[i] for name, value in batch.items()}
+        np.testing.assert_allclose(result[i], expr.evaluate(draw))
+
+
+def test_evaluate_batch_requires_common_draw_axis():
+    with pytest.raises(ValueError):
+        evaluate_batch(Symbol("x") + Symbol("y"), {"x": np.ones(3), "y": np.ones(4)})
+
+
+def test_evaluate_in_float32():
+    expr = normal_distribution(Symbol("mu"), Symbol("sigma"), Symbol("x"))
+    values = {"mu": 0.5, "sigma": 1.3, "x": np.linspace(-1, 1, 5)}
+    expected = expr.evaluate(values)
+    for result in (
+        expr.evaluate(values, np.float32),
+        evaluate_dag(expr, values, np.float32),
+        expr.compile(["x", "mu", "sigma"], backend="numpy", dtype=np.float32)(
+            values["x"], 0.5, 1.3
+        ),
+    ):
+        assert result.dtype == np.float32
+        np.testing.assert_allclose(result, expected, rtol=1e-6)
+
+
+def test_deep_tree_does_not_recurse():
+    x = Symbol("x")
+    expr = x
+    for i in range(5000):
+        expr = Exp(expr) if i % 2 else Ln(expr + 1)
+    assert expr.to_latex().startswith("e^{")
+    assert np.isfinite(expr.evaluate({"x": 0.5}))
+    assert sum(1 for _ in expr.postorder()) == 7500 + 2  # x and the shared 1
+
+
+def test_evaluate_many_shares_nodes_across_expressions(monkeypatch):
+    mu, sigma, x = Symbol("mu"), Symbol("sigma"), Symbol("x")
+    expr = normal_distribution(mu, sigma, x)
+    roots = [expr, *gradient(expr, [mu, sigma])]
+    values = {"mu": 0.5, "sigma": 1.3, "x": np.linspace(-1, 1, 5)}
+    expected = [root.evaluate(values) for root in roots]
+
+    calls = []
+    compute = Exp._compute
+    monkeypatch.setattr(
+        Exp, "_compute", lambda self, arg: calls.append(self) or compute(self, arg)
+    )
+    results = evaluate_many(roots, values)
+    assert len(calls) == 1
+    for result, want in zip(results, expected):
+        np.testing.assert_allclose(result, want)
+
+
+def test_evaluate_resolves_each_symbol_once(monkeypatch):
+    x = Symbol("x")
+    expr = x
+    for _ in range(50):
+        expr = Exp(expr * x) + x
+    calls = []
+    evaluate = Symbol.evaluate
+    monkeypatch.setattr(
+        Symbol,
+        "evaluate",
+        lambda self, values, dtype=None: (
+            calls.append(self) or evaluate(self, values, dtype)
+        ),
+    )
+    expr.evaluate({"x": np.linspace(-0.1, 0.1, 5)})
+    assert calls == [x]
+
+
+def test_single_operand_nary_nodes_do_not_alias_inputs():
+    x = Symbol("x")
+    for single in (NaryAdd([x]), NaryMul([x])):
+        # MulAdd adds into its product's buffer, and the product is `single`
+        expr = MulAdd(single, Constant(1.0), Constant(5.0))
+        for evaluate in (
+            lambda e, v: e.evaluate(v),
+            evaluate_dag,
+            lambda e, v: evaluate_many([e], v)[0],
+        ):
+            values = {"x": np.array([1.0, 2.0, 3.0])}
+            assert evaluate(single, values) is not values["x"]
+            np.testing.assert_allclose(evaluate(expr, values), [6.0, 7.0, 8.0])
+            np.testing.assert_allclose(values["x"], [1.0, 2.0, 3.0])
@@ -1,6 +1,35 @@
 # test_simplification.py
+import gc
 
-from symgraph.expression import Add, Constant, Divide, Exponentiation, Multiply, Subtract, Symbol
+import numpy as np
+
+from symgraph import expression
+from symgraph.evaluator import evaluate_batch, evaluate_dag, evaluate_many
+from symgraph.expression import (
+    _INTERN,
+    ONE,
+    ZERO,
+    Add,
+    Constant,
+    Divide,
+    Exp,
+    Exponentiation,
+    Ln,
+    Multiply,
+    NaryAdd,
+    Negation,
+    Pi,
+    Sqrt,
+    Subtract,
+    Symbol,
+    add,
+    const,
+    div,
+    mul,
+    neg,
+    power,
+    symbol,
+)
 
 
 def test_symbol_add_constant():
@@ -39,7 +68,7 @@ def test_rmul_symbol():
 
 def test_symbol_pow_constant():
     a = Symbol(name="a")
-    expr = a ** 2
+    expr = a**2
     assert isinstance(expr, Exponentiation)
     assert isinstance(expr.right, Constant)
     assert expr.right.value == 2
@@ -47,7 +76,7 @@ def test_symbol_pow_constant():
 
 def test_rpow_symbol():
     a = Symbol(name="a")
-    expr = 2 ** a
+    expr = 2**a
     assert isinstance(expr, Exponentiation)
     assert isinstance(expr.left, Constant)
     assert expr.left.value == 2
@@ -70,3 +99,195 @@ def test_rsub_symbol():
     assert isinstance(expr.left, Constant)
     assert expr.left.value == 5
     assert expr.right == a
+
+
+def test_smart_constructors_fold_constants():
+    assert mul(Constant(2), Constant(3)) == 6
+    assert add(Constant(2), Constant(0.5)) == Constant(2.5)
+    assert power(Constant(2), Constant(3)) == 8
+    assert div(Constant(1), Constant(0)).right == 0
+
+
+def test_smart_constructors_drop_identities():
+    a = Symbol(name="a")
+    assert mul(a, ZERO) is ZERO
+    assert mul(ONE, a) is a
+    assert add(ZERO, a) is a
+    assert power(a, ONE) is a
+    assert neg(neg(a)) is a
+
+
+def test_symbol_factory_interns():
+    assert symbol("a") is symbol("a")
+    assert symbol("a") is not symbol("a", "α")
+    assert symbol("a") == Symbol(name="a")
+
+
+def test_node_tags_are_distinct():
+    x = Symbol("x")
+    nodes = [Constant(1), x, x + 1, x - 1, x * 2, x / 2, x**2, Negation(x)]
+    nodes += [Sqrt(x), Exp(x), Ln(x)]
+    assert sorted(node.TAG for node in nodes) == list(range(len(nodes)))
+    assert Pi.TAG == Constant.TAG
+
+
+def test_smart_constructors_hash_cons():
+    x, y = Symbol("x"), Symbol("y")
+    assert mul(add(x, y), y) is mul(add(x, y), y)
+    assert add(x, y) is not add(y, x)
+    assert const(2.5) is const(2.5)
+    assert const(2.0) is not const(2)
+    size = len(_INTERN)
+    power(add(x, const(7)), y)
+    gc.collect()
+    assert len(_INTERN) == size
+
+
+def test_leaf_evaluate_does_not_copy():
+    c = Constant(2.5)
+    assert c.evaluate({}) is c.evaluate({})
+    assert not c.evaluate({}).flags.writeable
+    values = {"x": np.arange(3.0)}
+    assert Symbol("x").evaluate(values) is values["x"]
+
+
+def test_nodes_are_hashable():
+    x = Symbol("x")
+    expr = x + 1
+    assert {Constant(2), 2} == {2}
+    assert {x, Symbol("x")} == {x}
+    assert len({expr, x + 2, expr}) == 2
+
+
+def test_constructors_intern_nodes():
+    x = Symbol("x")
+    assert Symbol("x") is x
+    assert Add(x, 1) is x + 1
+    assert Exponentiation(left=x, right=2.5) is x**2.5
+    assert NaryAdd((x, x)) is NaryAdd([x, x])
+    assert Constant(-0.0) is not Constant(0.0)
+    assert Constant(0) is ZERO and Constant(0.0) is Constant(0.0)
+    assert Constant(-0.0) is Constant(-0.0)
+
+
+def test_large_int_constants():
+    big = Constant(10**400)
+    assert big is Constant(10**400)
+    folded = Constant(10) ** 400
+    assert isinstance(folded, Constant) and folded.value == 10**400
+
+
+def test_repr_of_deep_shared_dag():
+    x = Symbol("x")
+    shared = x
+    for _ in range(45):
+        shared = shared * shared + 1  # doubles the tree size per step
+    assert repr(shared).startswith("Add(<Multiply at 0x")
+    assert repr(shared).endswith(", Constant(1))")
+    deep = x
+    for _ in range(3000):
+        deep = Add(deep, Pi)
+    assert len(repr(deep)) < 100
+    assert (
+        repr(Add(x, Pi)) == "Add(Symbol('x'), SymbolicConstant('π', 3.141592653589793))"
+    )
+
+
+def test_str_of_deep_tree():
+    x = Symbol("x")
+    expr = x
+    for _ in range(2000):
+        expr = Add(expr, 1)
+    lines = str(expr).splitlines()
+    assert len(lines) == 4001
+    assert lines[0].endswith("Add")
+    assert ("    " * 2000 + "x") in lines[2000]
+
+
+def test_integer_powers_match_power():
+    x = Symbol("x")
+    values = {"x": np.linspace(-2.0, 3.0, 7)}
+    for exponent in (2, 3, -1, -2, 2.0, 4):
+        np.testing.assert_allclose(
+            Exponentiation(x, exponent).evaluate(values),
+            np.power(values["x"], float(exponent)),
+        )
+    ints = {"x": np.arange(4)}
+    assert Exponentiation(x, 2.0).evaluate(ints).dtype == np.float64
+
+
+def test_integer_powers_are_used_by_evaluate(monkeypatch):
+    calls = []
+
+    def cube(base):
+        calls.append(base)
+        return base * base * base
+
+    monkeypatch.setitem(expression._INTEGER_POWERS, 3, cube)
+    x = Symbol("x")
+    values = {"x": np.linspace(-2.0, 3.0, 7)}
+    np.testing.assert_allclose((x**3).evaluate(values), values["x"] ** 3)
+    np.testing.assert_allclose((x**3 + 1).evaluate(values), values["x"] ** 3 + 1)
+    assert len(calls) == 2
+    (x**3).evaluate({"x": np.arange(4)})  # integer bases keep numpy's power
+    assert len(calls) == 2
+    expected = values["x"] ** 3 + 1
+    np.testing.assert_allclose(evaluate_dag(x**3 + 1, values), expected)
+    np.testing.assert_allclose(evaluate_many([x**3 + 1], values)[0], expected)
+    batch = {"x": values["x"].reshape(7, 1)}
+    np.testing.assert_allclose(evaluate_batch(x**3 + 1, batch)[:, 0], expected)
+    assert len(calls) == 5
+    evaluate_dag(x**3, {"x": np.arange(4)})
+    assert len(calls) == 5
+
+
+def test_operators_share_number_constants():
+    x = Symbol("x")
+    assert (x + 2.5).right is (2.5 * x).left
+    assert (x - 1).right is ONE
+    assert (x + 1.0).right is not ONE
+
+
+def test_operators_fold_constants_and_identities():
+    x = Symbol("x")
+    folded = Constant(2) + 3 * Constant(4)
+    assert isinstance(folded, Constant) and folded.value == 14
+    assert x * 1 is x
+    assert x + 0 is x
+    assert x**1 is x
+    assert x**0 == 1
+    negated = -x
+    assert -negated is x
+    assert isinstance(2 * Pi, Multiply)  # symbolic constants stay symbolic
+
+
+def test_is_zero_and_is_one():
+    x = Symbol("x")
+    assert Constant(0).is_zero() and Constant(0.0).is_zero()
+    assert Constant(1).is_one() and not Constant(1).is_zero()
+    assert not x.is_zero() and not x.is_one()
+    assert not (x + 1).is_zero()
+    assert not Pi.is_one()
+
+
+def test_nodes_have_no_instance_dict():
+    x = Symbol("x")
+    nodes = [x, Constant(2.5), Pi, x + 1, -x, Exp(x), NaryAdd([x, x, x])]
+    for node in nodes:
+        assert not hasattr(node, "__dict__"), type(node)
+
+
+def test_to_latex_is_cached():
+    x = Symbol("x")
+    inner = Exp(x) / 2
+    first = inner.to_latex()
+    assert inner.to_latex() is first
+    assert (inner + x).to_latex() == first + " + x"
+
+
+def test_constant_reuses_cast_array():
+    c = Constant(2.5)
+    cast = c.evaluate({}, np.float32)
+    assert cast.dtype == np.float32 and c.evaluate({}, np.float32) is cast
+    assert c.evaluate({}).dtype == np.float64
+    assert c.evaluate({}, np.float16).dtype == np.float16
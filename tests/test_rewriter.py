@@ -1,18 +1,33 @@
 # test_rewriter.py
+import numpy as np
 import pytest
 
 from symgraph.expression import (
+    ONE,
+    ZERO,
+    Abs,
     Add,
-    Subtract,
-    Multiply,
     Constant,
     Divide,
+    Exp,
     Exponentiation,
+    Ln,
+    MulAdd,
+    Multiply,
+    NaryAdd,
+    NaryMul,
+    Sqrt,
+    Subtract,
     Symbol,
 )
 from symgraph.rewriter import (
     Rewriter,
+    all_rules,
+    applies_to,
+    fuse_multiply_add,
+    normalize,
     simplify_add_zero,
+    simplify_constant_fold,
     simplify_divide_by_zero_numerator,
     simplify_divide_with_common_factor,
     simplify_exponentiation,
@@ -25,16 +40,19 @@ from symgraph.rewriter import (
 
 @pytest.fixture
 def simplification_system():
-    return Rewriter([
-        simplify_multiply_by_zero,
-        simplify_multiply_by_one,
-        simplify_add_zero,
-        simplify_subtract_zero,
-        simplify_exponentiation,
-        simplify_divide_by_zero_numerator,
-        simplify_fractional_multiplication,
-        simplify_divide_with_common_factor,
-    ])
+    return Rewriter(
+        [
+            simplify_constant_fold,
+            simplify_multiply_by_zero,
+            simplify_multiply_by_one,
+            simplify_add_zero,
+            simplify_subtract_zero,
+            simplify_exponentiation,
+            simplify_divide_by_zero_numerator,
+            simplify_fractional_multiplication,
+            simplify_divide_with_common_factor,
+        ]
+    )
 
 
 def test_multiply_by_zero(simplification_system: Rewriter):
@@ -86,6 +104,25 @@ def test_divide_zero_numerator(simplification_system: Rewriter):
     assert simplified == Constant(value=0)
 
 
+def test_rules_return_shared_zero_and_one(simplification_system: Rewriter):
+    a = Symbol("a")
+    assert simplification_system(Multiply(a, Constant(0))) is ZERO
+    assert simplification_system(Divide(Constant(0), a)) is ZERO
+    assert simplification_system(Exponentiation(a, Constant(0))) is ONE
+    assert simplification_system(Divide(a, a)) is ONE
+
+
+def test_constant_fold(simplification_system: Rewriter):
+    a = Symbol("a")
+    expr = Multiply(
+        Add(Constant(2), Constant(3)), Exponentiation(Constant(2), Constant(3))
+    )
+    assert simplification_system(expr) == 40
+    assert simplification_system(Add(a, Add(Constant(1), Constant(2)))).right == 3
+    undefined = Divide(Constant(1), Constant(0))
+    assert simplification_system(undefined) is undefined
+
+
 def test_divide_same_symbol(simplification_system: Rewriter):
     a = Symbol("a")
     expr = Divide(a, a)
@@ -107,3 +144,133 @@ def test_divide_and_multiply_cancel(simplification_system: Rewriter):
     expr = Multiply(b, Divide(a, a))
     simplified = simplification_system(expr)
     assert simplified == b
+
+
+def test_rules_are_dispatched_by_node_type(simplification_system):
+    mul_rules = simplification_system.rules_for(Multiply)
+    assert simplify_multiply_by_zero in mul_rules
+    assert simplify_add_zero not in mul_rules
+    assert simplification_system.rules_for(Symbol) == []
+
+
+def test_normalize_flattens_chains():
+    a, b, c = Symbol("a"), Symbol("b"), Symbol("c")
+    expr = (a + 1) + (b + 2) + c * (a * 3) * 2
+    normalized = normalize(expr)
+    assert isinstance(normalized, NaryAdd)
+    assert normalized.operands[:2] == (a, b)
+    product = normalized.operands[2]
+    assert isinstance(product, NaryMul)
+    assert product.operands == (6, c, a)
+    assert normalized.operands[3] == 3
+    values = {"a": 0.5, "b": -1.5, "c": 2.0}
+    assert float(normalized.evaluate(values)) == pytest.approx(
+        float(expr.evaluate(values))
+    )
+
+
+def test_clean_subtrees_are_not_revisited():
+    calls = []
+
+    def count(node):
+        calls.append(node)
+        return node
+
+    a, b = Symbol("a"), Symbol("b")
+    shared = a * b
+    Rewriter([count])(shared + shared)
+    assert len(calls) == 4
+
+
+def test_rewritten_expressions_are_remembered():
+    calls = []
+
+    def count(node):
+        calls.append(node)
+        return node
+
+    a, b = Symbol("a"), Symbol("b")
+    rewriter = Rewriter([count])
+    product = a * b
+    assert rewriter(product) is product
+    assert rewriter(product) is product
+    assert len(calls) == 3
+    rewriter(product + a)
+    assert len(calls) == 5
+    assert all(node is not product for node in calls[3:])
+
+
+def test_rewriter_does_not_modify_input(simplification_system):
+    a = Symbol("a")
+    inner = Add(a, Constant(0))
+    expr = Multiply(inner, Symbol("b"))
+    result = simplification_system(expr)
+    assert expr.left is inner
+    assert result.left is a
+    assert list(result) == [a, expr.right]
+
+
+def test_cse_shares_identical_subtrees():
+    x, y = Symbol("x"), Symbol("y")
+    expr = Multiply(Add(x, y), Exponentiation(Add(y, Symbol("x")), Constant(2)))
+    shared = expr.cse()
+    assert shared.left is shared.right.left
+    assert isinstance(shared.right.right, Constant)
+    assert expr.left is not expr.right.left
+    values = {"x": 1.5, "y": -0.5}
+    assert float(shared.evaluate(values)) == float(expr.evaluate(values))
+
+
+def test_fuse_multiply_add():
+    x, y = Symbol("x"), Symbol("y")
+    shared = Multiply(x, y)
+    expr = Add(Multiply(x, Constant(3)), y) + Add(shared, shared)
+    fused = fuse_multiply_add(expr)
+    assert isinstance(fused.left, MulAdd)
+    assert fused.right.left is shared
+    values = {"x": np.linspace(0, 1, 4), "y": np.arange(4.0)}
+    np.testing.assert_allclose(fused.evaluate(values), expr.evaluate(values))
+    np.testing.assert_allclose(fused.evaluate_dag(values), expr.evaluate(values))
+
+
+def test_simplify_folds_constants_and_identities():
+    x = Symbol("x")
+    expr = Multiply(Add(x, Constant(0)), Add(Constant(2), Constant(3))) + Multiply(
+        Exponentiation(x, Constant(1)), Constant(0)
+    )
+    simplified = expr.simplify()
+    assert isinstance(simplified, Multiply)
+    assert simplified.left is x
+    assert simplified.right == 5
+
+
+def test_simplify_sqrt_of_square_is_abs():
+    x = Symbol("x")
+    simplified = Sqrt(x**2).simplify()
+    assert isinstance(simplified, Abs)
+    values = {"x": np.array([-2.0, 3.0])}
+    np.testing.assert_allclose(simplified.evaluate(values), [2.0, 3.0])
+
+
+@pytest.mark.parametrize("rule", all_rules, ids=lambda rule: rule.__name__)
+def test_rules_return_their_input_when_they_do_not_apply(rule):
+    x, y = Symbol("x"), Symbol("y")
+    for cls in rule.node_types:
+        node = cls(x) if cls in (Exp, Ln) else cls(x, y)
+        assert rule(node) is node
+
+
+def test_rewriter_stops_at_rule_cycles():
+    a, b = Symbol("a"), Symbol("b")
+    swap = applies_to(Add)(lambda node: Add(node.right, node.left))
+    simplified = Rewriter([swap])(Exp(a + b))
+    assert isinstance(simplified, Exp)
+    assert {simplified.operand.left, simplified.operand.right} == {a, b}
+
+
+def test_rewriter_handles_deep_trees(simplification_system: Rewriter):
+    a = Symbol("a")
+    expr = a
+    for _ in range(3000):
+        expr = Add(Multiply(expr, Constant(1)), Constant(0))
+    assert simplification_system(expr) is a